@@ -14,14 +14,21 @@
 # jq -S '.' output.txt  > output_sorted.txt
 
 import argparse
+import itertools
 import json
+import logging
 import sys
 from sys import argv
+from variantapi.cache import SQLiteCache
+from variantapi.checkpoint import CheckpointedBatchJob
 from variantapi.client import VariantAPIClient
+from variantapi.ndjson import NDJSONWriter
+from variantapi.resultindex import ResultIndexWriter, index_path_for
 
 __author__ = 'stephanos-androutsellis, Leopold von Seckendorff'
 
 def main(argv):
+    logging.basicConfig(level=logging.INFO)
     infile = ''
     outfile = ''
 
@@ -42,6 +49,29 @@ def main(argv):
         metavar='Output File',
         required=True
         )
+    parser.add_argument(
+        '-f',
+        help='Output format: json (default, a single indented document), '
+            'ndjson (one compact line per variant, written as results '
+            'arrive, gzipped if the output file ends with .gz) or parquet '
+            '(the columns given with -C, needs pyarrow)',
+        type=str,
+        metavar='Output Format',
+        required=False,
+        choices=['json', 'ndjson', 'parquet'],
+        default='json'
+        )
+    parser.add_argument(
+        '-C',
+        help='Columns of parquet output, as annotation paths optionally '
+            'named with name=path e.g. chromosome pos '
+            'gene=refseq_transcripts[0].items[].gene_symbol. The source '
+            'databases they need are requested unless -p is given',
+        type=str,
+        metavar='Columns',
+        required=False,
+        nargs='+'
+        )
     parser.add_argument(
         '-n',
         help='Number of variants per GET request',
@@ -50,6 +80,42 @@ def main(argv):
         required=False,
         default=10000
         )
+    parser.add_argument(
+        '-t',
+        help='Tune the batch size (up to -n) so that a request takes about '
+            'this many seconds',
+        type=float,
+        metavar='Target Latency',
+        required=False
+        )
+    parser.add_argument(
+        '-w',
+        help='Number of batch requests to run concurrently',
+        type=int,
+        metavar='Workers',
+        required=False,
+        default=1
+        )
+    parser.add_argument(
+        '-r',
+        help='Number of times a throttled or failed request is retried',
+        type=int,
+        metavar='Retries',
+        required=False,
+        default=3
+        )
+    parser.add_argument(
+        '-l',
+        help='Maximum number of requests per second',
+        type=float,
+        metavar='Rate Limit',
+        required=False
+        )
+    parser.add_argument(
+        '-z',
+        help='Compress request bodies with gzip',
+        action='store_true'
+        )
     parser.add_argument(
         '-k',
         help='Your key to the API',
@@ -65,6 +131,54 @@ def main(argv):
         required=False,
         default='hg19'
         )
+    parser.add_argument(
+        '-c',
+        help='Annotation cache file. Variants found in it are not '
+            'looked up again',
+        type=str,
+        metavar='Cache File',
+        required=False
+        )
+    parser.add_argument(
+        '-j',
+        help='Journal file recording completed chunks. Re-running a job '
+            'with the same journal resumes it where it stopped',
+        type=str,
+        metavar='Journal File',
+        required=False
+        )
+    parser.add_argument(
+        '-d',
+        help='Look up repeated variants only once',
+        action='store_true'
+        )
+    parser.add_argument(
+        '-V',
+        help='Validate and normalise variants before sending them. '
+            'Invalid variants are written with the error instead of '
+            'failing their batch',
+        action='store_true'
+        )
+    parser.add_argument(
+        '-e',
+        help='Find the variants failing a batch with a 400 and '
+            'write them with the error, instead of stopping',
+        action='store_true'
+        )
+    parser.add_argument(
+        '-x',
+        help='Write an index of the ndjson output to <output>.idx, for '
+            'random access with variantapi.resultindex.ResultIndex',
+        action='store_true'
+        )
+    parser.add_argument(
+        '-m',
+        help='Write request metrics (latencies, bytes, retries) to this '
+            'file in the prometheus text format',
+        type=str,
+        metavar='Metrics File',
+        required=False
+        )
     parser.add_argument(
         '-p',
         help='Request parameters '
@@ -76,11 +190,26 @@ def main(argv):
         )
 
     args = parser.parse_args()
+    if args.f == 'parquet' and not args.C:
+        parser.error('parquet output needs columns (-C)')
+    if args.V and args.j:
+        parser.error('validation (-V) can not be used with a journal (-j)')
+    if args.d and args.j:
+        parser.error('de-duplication (-d) can not be used with a journal (-j)')
+    if args.t and args.j:
+        # journaled chunks have a fixed size (-n), so they can be resumed
+        parser.error('batch size tuning (-t) can not be used with a journal '
+                     '(-j)')
+    if args.x and (args.f != 'ndjson' or args.o.endswith('.gz')):
+        parser.error('an index (-x) needs uncompressed ndjson output')
     infile = args.i
     outfile = args.o
+    output_format = args.f
     batch_size = args.n
+    max_workers = args.w
     api_key = args.k
     ref_genome = args.g
+    cache = SQLiteCache(args.c) if args.c else None
     request_parameters = None
     if args.p:
         request_parameters = {param[0]: param[1] for param in [
@@ -88,29 +217,107 @@ def main(argv):
             ]
         }
 
-    # Open and load input file into list
-    print('Reading input file ', infile)
-    with open(infile) as fi:
-        variants = fi.readlines()
-    variants = [v.strip('\n') for v in variants]
-
     # Initialize client connection to API
-    api = VariantAPIClient(api_key, batch_size=batch_size)
+    api = VariantAPIClient(
+        api_key,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        cache=cache,
+        target_latency=args.t,
+        max_retries=args.r,
+        rate_limit=args.l,
+        compress_requests='gzip' if args.z else None
+        )
     if (api is None):
         print('Failed to connect to API')
         sys.exit()
 
-    print('posting GET requests... ', end='')
-    results = api.batch_lookup(
-        variants,
-        params=request_parameters,
-        ref_genome=ref_genome
-        )
-    print('done')
+    if output_format == 'parquet':
+        # imported here, pyarrow is only needed for parquet output
+        from variantapi.columnar import ParquetResultWriter
+        writer = ParquetResultWriter(
+            outfile,
+            args.C,
+            schema=api.schema(),
+            row_group_size=batch_size
+            )
+        if request_parameters is None:
+            request_parameters = writer.projection.params()
+
+    # Read the input file lazily, one variant per line
+    print('Reading input file ', infile)
+    with open(infile) as fi:
+        variants = (v.strip('\n') for v in fi)
+        if args.x or output_format == 'parquet':
+            # the queries are indexed, or written, along with their results
+            variants, queries = itertools.tee(variants)
+
+        print('posting GET requests... ', end='')
+        if args.j:
+            job = CheckpointedBatchJob(
+                api,
+                args.j,
+                params=request_parameters,
+                ref_genome=ref_genome,
+                isolate_errors=args.e
+                )
+            results = job.iter_results(variants)
+        elif args.d:
+            # de-duplication needs to see the whole input at once
+            results = api.batch_lookup(
+                list(variants),
+                params=request_parameters,
+                ref_genome=ref_genome,
+                deduplicate=True,
+                validate=args.V,
+                isolate_errors=args.e
+                )
+        else:
+            results = api.iter_batch_lookup(
+                variants,
+                params=request_parameters,
+                ref_genome=ref_genome,
+                validate=args.V,
+                isolate_errors=args.e
+                )
+
+        if output_format == 'parquet':
+            # row groups are written as their chunks arrive
+            print('writing to output file ', outfile, '... ', end='')
+            with writer:
+                writer.write_all(results, queries)
+            print('done, {} rows in {} row groups'.format(
+                writer.rows, writer.row_groups))
+        elif output_format == 'ndjson':
+            # results are written as their chunks arrive
+            print('writing to output file ', outfile, '... ', end='')
+            with NDJSONWriter(outfile) as fo:
+                if args.x:
+                    with ResultIndexWriter(index_path_for(outfile)) as index:
+                        for result, query in zip(results, queries):
+                            index.add(fo.write(result), result, query)
+                else:
+                    fo.write_all(results)
+            print('done')
+        else:
+            results = list(results)
+            print('done')
+            print('writing output file ', outfile)
+            with open (outfile, 'w') as fo:
+                fo.write(json.dumps(results, indent=4))
 
-    print('writing output file ', outfile)
-    with open (outfile, 'w') as fo:
-        fo.write(json.dumps(results, indent=4))
+    if args.j:
+        print('chunks resumed from journal: {}, looked up: {}'.format(
+            job.skipped_chunks, job.completed_chunks))
+    print(api.transfer_stats)
+    print('{} variants at {:.1f} variants/s, {} retries'.format(
+        api.metrics.variants, api.metrics.variants_per_second,
+        sum(api.metrics.retries.values())))
+    if args.m:
+        with open(args.m, 'w') as fm:
+            fm.write(api.metrics.prometheus())
+    if cache is not None:
+        print('cache hits: {}, misses: {}'.format(cache.hits, cache.misses))
 
 if __name__ == '__main__':
     main(argv)
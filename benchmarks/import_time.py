@@ -0,0 +1,169 @@
+"""import time benchmark of the client modules.
+
+imports every module in fresh interpreters (python -X importtime) and
+reports the fastest and the median time, and which of the modules the
+client only needs once it is used (requests, sqlite3, ...) the import
+loaded anyway. e.g.::
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --save import_baseline.json
+    python -m benchmarks.import_time --baseline import_baseline.json
+
+run it from the repository root. With --baseline it exits with status 1
+if an import got slower by more than --tolerance, or loads one of the
+deferred modules.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules variantapi imports on first use only
+DEFERRED = [
+    'requests', 'urllib3', 'sqlite3', 'email.utils', 'orjson',
+    'concurrent.futures.thread', 'pyarrow', 'aiohttp',
+    ]
+
+_REPORT = (
+    'import json, logging, sys\n'
+    'import {module}\n'
+    'print(json.dumps({{\n'
+    '    "deferred": [m for m in {deferred!r} if m in sys.modules],\n'
+    '    "root_handlers": len(logging.getLogger().handlers),\n'
+    '    }}))\n'
+    )
+
+
+def _python(args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    # without bytecode caches the first run would time compilation
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+        )
+
+
+def import_seconds(module):
+    """seconds a fresh interpreter spends importing module"""
+    stderr = _python(['-X', 'importtime', '-c', 'import ' + module]).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    raise RuntimeError('no import time of {} in {!r}'.format(module, stderr))
+
+
+def bench_import(module, repeat):
+    _python(['-c', 'import ' + module])
+    seconds = [import_seconds(module) for _ in range(repeat)]
+    report = json.loads(_python(
+        ['-c', _REPORT.format(module=module, deferred=DEFERRED)]).stdout)
+    return {
+        'module': module,
+        'min': min(seconds),
+        'median': statistics.median(seconds),
+        'deferred': report['deferred'],
+        'root_handlers': report['root_handlers'],
+        }
+
+
+def print_result(result):
+    print('{:<28} min {:>7.1f}ms  median {:>7.1f}ms  {}{}'.format(
+        result['module'], result['min'] * 1000, result['median'] * 1000,
+        'loads ' + ' '.join(result['deferred']) if result['deferred'] else '',
+        '  configures logging' if result['root_handlers'] else ''))
+    sys.stdout.flush()
+
+
+def compare(results, baseline, tolerance):
+    """return descriptions of the results that are worse than the
+    baseline by more than tolerance (a fraction)."""
+    previous = dict((r['module'], r) for r in baseline)
+    regressions = []
+    for r in results:
+        b = previous.get(r['module'])
+        if b is None:
+            continue
+        if r['min'] > b['min'] * (1 + tolerance):
+            regressions.append('{}: imports in {:.1f}ms, was {:.1f}ms'.format(
+                r['module'], r['min'] * 1000, b['min'] * 1000))
+        loaded = sorted(set(r['deferred']) - set(b['deferred']))
+        if loaded:
+            regressions.append('{}: imports {}'.format(
+                r['module'], ' '.join(loaded)))
+        if r['root_handlers'] > b['root_handlers']:
+            regressions.append('{}: configures logging on import'.format(
+                r['module']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the import time of the client modules'
+        )
+    parser.add_argument(
+        '--modules',
+        help='Modules to import',
+        type=str,
+        nargs='+',
+        default=['variantapi.client', 'variantapi.normalise',
+                 'variantapi.resultindex']
+        )
+    parser.add_argument(
+        '--repeat',
+        help='Fresh interpreters each module is imported in',
+        type=int,
+        default=10
+        )
+    parser.add_argument(
+        '--save',
+        help='Write the results to this json file',
+        type=str
+        )
+    parser.add_argument(
+        '--baseline',
+        help='Compare with the results saved in this json file',
+        type=str
+        )
+    parser.add_argument(
+        '--tolerance',
+        help='Fraction by which an import may get slower before it counts '
+            'as a regression',
+        type=float,
+        default=0.5
+        )
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = bench_import(module, args.repeat)
+        print_result(result)
+        results.append(result)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
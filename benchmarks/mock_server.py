@@ -0,0 +1,336 @@
+"""a local stand-in for the variant api, for benchmarks.
+
+serves /lookup/schema/, /lookup/{query}/{genome} and
+/lookup/batch/{genome} with synthetic annotations, and can simulate
+server latency, large responses, failing requests and rate limiting.
+Run it on its own with::
+
+    python -m benchmarks.mock_server --port 8000 --latency 0.05
+
+and point a client at it with api_url='http://127.0.0.1:8000' or the
+VARSOME_API_URL environment variable.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+SCHEMA = {
+    'chromosome': 'string', 'pos': 'integer', 'ref': 'string',
+    'alt': 'string', 'variant_id': 'string', 'variant_type': 'string',
+    'refseq_transcripts': 'list', 'ensembl_transcripts': 'list',
+    }
+
+
+def annotation(query, padding=0):
+    """synthetic annotation of a chrom:pos:ref:alt query (anything else
+    gets made up coordinates)"""
+    parts = query.split(':')
+    if len(parts) == 4 and parts[1].isdigit():
+        chrom, pos, ref, alt = parts
+        pos = int(pos)
+    else:
+        chrom, ref, alt = 'chr1', 'A', 'T'
+        pos = zlib.crc32(query.encode('utf8')) % 248000000 + 1
+    if not chrom.startswith('chr'):
+        chrom = 'chr' + chrom
+    gene = 'GENE{}'.format(pos % 1000)
+    result = {
+        'chromosome': chrom,
+        'pos': pos,
+        'ref': ref,
+        'alt': alt,
+        'variant_id': '1019{:08d}{:09d}'.format(
+            zlib.crc32(chrom.encode('utf8')) % 10 ** 8, pos),
+        'variant_type': 'SNV' if len(ref) == len(alt) == 1 else 'Indel',
+        'refseq_transcripts': [{'items': [
+            {'name': 'NM_{:06d}.1'.format(pos % 999999),
+             'gene_symbol': gene},
+            ]}],
+        'ensembl_transcripts': [{'items': [
+            {'name': 'ENST{:011d}'.format(pos), 'gene_symbol': gene},
+            ]}],
+        }
+    if padding:
+        result['padding'] = 'x' * padding
+    return result
+
+
+class MockVarsomeServer(object):
+    """threaded http server answering like the variant api.
+
+    :param port: port to listen on, 0 picks a free one
+    :param latency: seconds added to every response
+    :param latency_per_variant: seconds added per variant of a batch
+    :param payload_size: bytes of padding added to every annotation
+    :param error_rate: fraction of requests answered with error_status
+    :param error_status: status of injected errors
+    :param rate_limit: requests per second accepted (bursts of up to
+        one second worth of them), further ones get a 403. None
+        accepts all.
+    :param retry_after: Retry-After seconds sent with throttled responses
+    :param seed: seed of the error injection
+    :param bad_queries: queries the api rejects, requests containing
+        any of them get a 400
+    """
+
+    def __init__(self, port=0, latency=0.0, latency_per_variant=0.0,
+                 payload_size=0, error_rate=0.0, error_status=503,
+                 rate_limit=None, retry_after=None, seed=0, bad_queries=()):
+        self.latency = latency
+        self.latency_per_variant = latency_per_variant
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.bad_queries = set(bad_queries)
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._refilled = time.time()
+        self.reset()
+
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def reset(self):
+        """forget the recorded requests"""
+        with self._lock:
+            self.durations = []
+            self.statuses = {}
+            self.variants = 0
+            # requests being answered, and the most at the same time
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _throttled(self):
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.time()
+            self._tokens = min(
+                self.rate_limit,
+                self._tokens + (now - self._refilled) * self.rate_limit
+                )
+            self._refilled = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def _failed(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _finished(self):
+        # before the response is sent, the client may send its next
+        # request as soon as it has it
+        with self._lock:
+            self.in_flight -= 1
+
+    def _record(self, status, seconds, variants):
+        with self._lock:
+            self.durations.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.variants += variants
+
+    def latency_quantile(self, q):
+        """q-quantile of the seconds spent answering requests"""
+        with self._lock:
+            durations = sorted(self.durations)
+        if not durations:
+            return None
+        return durations[min(len(durations) - 1, int(q * len(durations)))]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients going away (e.g. a failing script) are not errors here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send headers and body together and at once, otherwise small
+    # responses wait for delayed acks and single lookups look slow
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, data=None, headers=()):
+        body = json.dumps(data).encode('utf8') if data is not None else b''
+        self.send_response(status)
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and body:
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        return json.loads(body.decode('utf8')) if body else {}
+
+    def _handle(self, method):
+        start = time.time()
+        mock = self.server.mock
+        mock._started()
+        parts = [unquote(p) for p in urlsplit(self.path).path.split('/') if p]
+        body = self._read_body() if method == 'POST' else None
+
+        queries = []
+        data = None
+        if parts[:1] != ['lookup'] or len(parts) not in (2, 3):
+            status, data = 404, {'detail': 'Not found'}
+        elif method == 'GET' and parts[1] == 'schema':
+            status, data = 200, SCHEMA
+        elif method == 'POST' and parts[1] == 'batch':
+            if 'Authorization' not in self.headers:
+                status, data = 401, {'detail': 'Not authorized'}
+            else:
+                queries = body.get('variants', [])
+                status = 200
+        elif method == 'GET' and len(parts) == 3:
+            queries = [parts[1]]
+            status = 200
+        else:
+            status, data = 404, {'detail': 'Not found'}
+
+        headers = []
+        if status == 200 and mock.bad_queries.intersection(queries):
+            status, data = 400, {'detail': 'Invalid variant'}
+            queries = []
+        elif status == 200 and mock._throttled():
+            status, data = 403, {'detail': 'Request was throttled'}
+            if mock.retry_after is not None:
+                headers.append(('Retry-After', str(mock.retry_after)))
+            queries = []
+        elif status == 200 and mock._failed():
+            status, data = mock.error_status, {'detail': 'Injected error'}
+            queries = []
+
+        delay = mock.latency + mock.latency_per_variant * len(queries)
+        if delay:
+            time.sleep(delay)
+        if status == 200 and data is None:
+            results = [annotation(q, mock.payload_size) for q in queries]
+            data = results if parts[1] == 'batch' else results[0]
+        mock._finished()
+        self._respond(status, data, headers)
+        mock._record(status, time.time() - start, len(queries))
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Local mock of the variant api for benchmarks'
+        )
+    parser.add_argument(
+        '--port',
+        help='Port to listen on',
+        type=int,
+        default=8000
+        )
+    parser.add_argument(
+        '--latency',
+        help='Seconds added to every response',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--latency-per-variant',
+        help='Seconds added per variant of a batch',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--payload-size',
+        help='Bytes of padding added to every annotation',
+        type=int,
+        default=0
+        )
+    parser.add_argument(
+        '--error-rate',
+        help='Fraction of requests failing with a 503',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--rate-limit',
+        help='Requests per second accepted before answering 403',
+        type=float
+        )
+    args = parser.parse_args()
+    server = MockVarsomeServer(
+        port=args.port,
+        latency=args.latency,
+        latency_per_variant=args.latency_per_variant,
+        payload_size=args.payload_size,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit
+        )
+    print('serving on', server.url)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
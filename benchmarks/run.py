@@ -0,0 +1,424 @@
+"""offline throughput benchmarks of the client and the command line scripts.
+
+starts a MockVarsomeServer and runs every scenario against it in a
+separate process, reporting variants per second, the p50 and p99
+latency of the requests (measured by the server) and the peak resident
+memory of the process. e.g.::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 2000 2000000 --workers 4
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --baseline baseline.json   # exits 1 on regressions
+
+run it from the repository root.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_server import MockVarsomeServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VCF = os.path.join(ROOT, 'sample.vcf')
+API_KEY = 'benchmark'
+BASES = 'ACGT'
+
+
+def _peak_rss_mb(ru_maxrss):
+    # kilobytes on linux, bytes on macos
+    if sys.platform == 'darwin':
+        return ru_maxrss / 1024.0 / 1024.0
+    return ru_maxrss / 1024.0
+
+
+def _synthetic_variants(n, seed=0):
+    """yield n chrom:pos:ref:alt queries in genome order"""
+    rng = random.Random(seed)
+    per_chrom = max(1, n // 22 + 1)
+    count = 0
+    for chrom in range(1, 23):
+        pos = 10000
+        for _ in range(per_chrom):
+            if count == n:
+                return
+            pos += rng.randint(1, 2000)
+            ref = rng.choice(BASES)
+            alt = rng.choice(BASES.replace(ref, ''))
+            if rng.random() < 0.1:
+                # some multi-allelic sites
+                alt += ',' + rng.choice(BASES.replace(ref, ''))
+            yield str(chrom), pos, ref, alt
+            count += 1
+
+
+def write_variants(path, n):
+    with open(path, 'w') as f:
+        for chrom, pos, ref, alt in _synthetic_variants(n):
+            f.write('chr{}:{}:{}:{}\n'.format(chrom, pos, ref, alt.split(',')[0]))
+
+
+def write_vcf(path, n):
+    with open(path, 'w') as f:
+        f.write('##fileformat=VCFv4.1\n')
+        f.write('#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n')
+        for chrom, pos, ref, alt in _synthetic_variants(n):
+            f.write('{}\t{}\t.\t{}\t{}\t50\tPASS\tDP=10\n'.format(
+                chrom, pos, ref, alt))
+
+
+def count_records(path):
+    with open(path) as f:
+        return sum(1 for line in f if line.strip() and not line.startswith('#'))
+
+
+# in-process scenarios, each run in a fresh process
+
+def bench_lookup(url, n, options):
+    from variantapi.client import VariantAPIClient
+    api = VariantAPIClient(
+        API_KEY, api_url=url, max_retries=options['retries'])
+    start = time.time()
+    for chrom, pos, ref, alt in _synthetic_variants(n):
+        api.lookup('chr{}:{}:{}:{}'.format(chrom, pos, ref, alt.split(',')[0]))
+    seconds = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, _peak_rss_mb(rss)
+
+
+def bench_lookup_many(url, n, options):
+    from variantapi.client import VariantAPIClient
+    api = VariantAPIClient(
+        API_KEY,
+        api_url=url,
+        lookup_workers=options['lookup_workers'],
+        max_retries=options['retries']
+        )
+    queries = (
+        'chr{}:{}:{}:{}'.format(chrom, pos, ref, alt.split(',')[0])
+        for chrom, pos, ref, alt in _synthetic_variants(n)
+        )
+    start = time.time()
+    for _ in api.iter_lookup_many(queries):
+        pass
+    seconds = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, _peak_rss_mb(rss)
+
+
+def bench_batch_lookup(url, path, options):
+    from variantapi.client import VariantAPIClient
+    api = VariantAPIClient(
+        API_KEY,
+        api_url=url,
+        batch_size=options['batch_size'],
+        max_workers=options['workers'],
+        max_retries=options['retries']
+        )
+    start = time.time()
+    with open(path) as variants:
+        for _ in api.iter_batch_lookup(variants):
+            pass
+    seconds = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, _peak_rss_mb(rss)
+
+
+def run_in_process(func, *args):
+    """run func(*args) in a new python process, so that its peak memory
+    is not shared with other scenarios."""
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_script(url, script, args):
+    """run a command line script, return (seconds, peak rss in MB)."""
+    path = [ROOT] + [p for p in [os.environ.get('PYTHONPATH')] if p]
+    env = dict(
+        os.environ,
+        VARSOME_API_URL=url,
+        PYTHONPATH=os.pathsep.join(path)
+        )
+    with tempfile.TemporaryFile() as stderr:
+        start = time.time()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, script)] + args,
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr
+            )
+        # wait4 reports the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.time() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode:
+            stderr.seek(0)
+            raise RuntimeError('{} failed: {}'.format(
+                script, stderr.read().decode('utf8', 'replace')))
+    return seconds, _peak_rss_mb(usage.ru_maxrss)
+
+
+def scenarios(options, tmpdir):
+    """yield (name, size, variants, function, args) of all scenarios"""
+    workers = ['-w', str(options['workers'])]
+    batch = ['-n', str(options['batch_size'])]
+
+    n = options['lookups']
+    yield 'lookup', n, n, bench_lookup, (n, options)
+    yield 'lookup_many', n, n, bench_lookup_many, (n, options)
+    queries = [
+        'chr{}:{}:{}:{}'.format(c, p, r, a.split(',')[0])
+        for c, p, r, a in _synthetic_variants(min(n, 100))
+        ]
+    yield ('smallRequestClient', len(queries), len(queries), run_script,
+           ('smallRequestClient.py', ['-k', API_KEY, '-q'] + queries))
+
+    vcf_inputs = [('sample.vcf', SAMPLE_VCF)] if os.path.exists(SAMPLE_VCF) else []
+    for size in options['sizes']:
+        variants = os.path.join(tmpdir, 'variants_{}.txt'.format(size))
+        write_variants(variants, size)
+        yield ('batch_lookup', size, size, bench_batch_lookup,
+               (variants, options))
+        yield ('batchRequestClient', size, size, run_script, (
+            'batchRequestClient.py',
+            ['-i', variants, '-o', os.path.join(tmpdir, 'out.json'),
+             '-k', API_KEY, '-f', options['format']] + batch + workers))
+
+        vcf = os.path.join(tmpdir, 'variants_{}.vcf'.format(size))
+        write_vcf(vcf, size)
+        vcf_inputs.append((size, vcf))
+
+    for size, vcf in vcf_inputs:
+        yield ('simpleVCFClient', size, count_records(vcf), run_script, (
+            'simpleVCFClient.py',
+            ['-i', vcf, '-o', os.path.join(tmpdir, 'out.vcf'), '-k', API_KEY]
+            + batch + workers))
+
+
+def run(options):
+    server = MockVarsomeServer(
+        latency=options['latency'],
+        latency_per_variant=options['latency_per_variant'],
+        payload_size=options['payload_size'],
+        error_rate=options['error_rate'],
+        rate_limit=options['rate_limit'],
+        retry_after=options['retry_after']
+        )
+    results = []
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with server:
+            for name, size, variants, func, args in scenarios(options, tmpdir):
+                if options['only'] and name not in options['only']:
+                    continue
+                server.reset()
+                try:
+                    if func is run_script:
+                        seconds, rss = run_script(server.url, *args)
+                    else:
+                        seconds, rss = run_in_process(func, server.url, *args)
+                except Exception as e:
+                    # e.g. a script without retries hitting injected errors
+                    lines = str(e).strip().splitlines() or [repr(e)]
+                    result = {'scenario': name, 'size': size,
+                              'error': lines[-1]}
+                    results.append(result)
+                    print('{:<20} {:>9} FAILED {}'.format(
+                        name, size, result['error']))
+                    continue
+                result = {
+                    'scenario': name,
+                    'size': size,
+                    'seconds': seconds,
+                    'variants_per_second': variants / seconds,
+                    'p50': server.latency_quantile(0.5),
+                    'p99': server.latency_quantile(0.99),
+                    'peak_rss_mb': rss,
+                    'statuses': dict(
+                        (str(k), v) for k, v in server.statuses.items()),
+                    }
+                results.append(result)
+                print_result(result)
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def _ms(seconds):
+    return '-' if seconds is None else '{:.1f}'.format(seconds * 1000)
+
+
+def print_result(result):
+    print('{:<20} {:>9} {:>9.2f}s {:>12.0f}/s  p50 {:>7}ms  p99 {:>7}ms  '
+          '{:>8.1f} MB  {}'.format(
+              result['scenario'], result['size'], result['seconds'],
+              result['variants_per_second'], _ms(result['p50']),
+              _ms(result['p99']), result['peak_rss_mb'],
+              ' '.join('{}:{}'.format(k, v)
+                       for k, v in sorted(result['statuses'].items()))))
+    sys.stdout.flush()
+
+
+def compare(results, baseline, tolerance):
+    """return descriptions of the results that are worse than the
+    baseline by more than tolerance (a fraction)."""
+    previous = dict(
+        ((r['scenario'], str(r['size'])), r) for r in baseline)
+    regressions = []
+    for r in results:
+        b = previous.get((r['scenario'], str(r['size'])))
+        if b is None or 'error' in b:
+            continue
+        if 'error' in r:
+            regressions.append('{} {}: failed with {}'.format(
+                r['scenario'], r['size'], r['error']))
+            continue
+        if r['variants_per_second'] < b['variants_per_second'] * (1 - tolerance):
+            regressions.append('{} {}: {:.0f} variants/s, was {:.0f}'.format(
+                r['scenario'], r['size'], r['variants_per_second'],
+                b['variants_per_second']))
+        if r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance):
+            regressions.append('{} {}: {:.1f} MB peak rss, was {:.1f}'.format(
+                r['scenario'], r['size'], r['peak_rss_mb'], b['peak_rss_mb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the client against a local mock api'
+        )
+    parser.add_argument(
+        '--sizes',
+        help='Numbers of synthetic variants for the batch and VCF scenarios',
+        type=int,
+        nargs='+',
+        default=[2000]
+        )
+    parser.add_argument(
+        '--lookups',
+        help='Number of single variant lookups',
+        type=int,
+        default=200
+        )
+    parser.add_argument(
+        '--only',
+        help='Scenarios to run, e.g. batch_lookup simpleVCFClient',
+        type=str,
+        nargs='+'
+        )
+    parser.add_argument(
+        '--batch-size',
+        help='Variants per batch request',
+        type=int,
+        default=10000
+        )
+    parser.add_argument(
+        '--workers',
+        help='Concurrent batch requests',
+        type=int,
+        default=1
+        )
+    parser.add_argument(
+        '--lookup-workers',
+        help='Concurrent single lookups of lookup_many',
+        type=int,
+        default=8
+        )
+    parser.add_argument(
+        '--retries',
+        help='Retries of failed or throttled requests',
+        type=int,
+        default=3
+        )
+    parser.add_argument(
+        '--format',
+        help='Output format of batchRequestClient.py',
+        type=str,
+        choices=['json', 'ndjson'],
+        default='json'
+        )
+    parser.add_argument(
+        '--latency',
+        help='Seconds the server adds to every response',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--latency-per-variant',
+        help='Seconds the server adds per variant of a batch',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--payload-size',
+        help='Bytes of padding in every annotation',
+        type=int,
+        default=0
+        )
+    parser.add_argument(
+        '--error-rate',
+        help='Fraction of requests failing with a 503',
+        type=float,
+        default=0.0
+        )
+    parser.add_argument(
+        '--rate-limit',
+        help='Requests per second the server accepts before answering 403',
+        type=float
+        )
+    parser.add_argument(
+        '--retry-after',
+        help='Retry-After seconds of throttled responses',
+        type=float
+        )
+    parser.add_argument(
+        '--save',
+        help='Write the results to this json file',
+        type=str
+        )
+    parser.add_argument(
+        '--baseline',
+        help='Compare with the results saved in this json file',
+        type=str
+        )
+    parser.add_argument(
+        '--tolerance',
+        help='Fraction by which throughput may drop, or memory grow, '
+            'before a result counts as a regression',
+        type=float,
+        default=0.2
+        )
+    args = parser.parse_args()
+    options = dict(
+        (k, v) for k, v in vars(args).items()
+        if k not in ('save', 'baseline', 'tolerance')
+        )
+
+    results = run(options)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -31,4 +31,9 @@ setup(
     install_requires=[
         'requests>=2.0.0, <3.0.0'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.0.0, <4.0.0'],
+        'fast-json': ['orjson'],
+        'parquet': ['pyarrow'],
+    },
 )
@@ -7,52 +7,147 @@
 #   sending a number of variants at a time), or one by one. 
 # - Extends the VCF description to include gene information for each entry that
 #   is retreived from the response received from the API.
-# - Saves the result, including the gene information (a comma-separated list of 
-#   gene symbols for each variant) in a new file in the VCF format.
+# - Saves the result, including the gene information in a new file in the VCF format.
 #   Note that if a row in the input VCF file contains more than one ALT field 
-#   entries, i.e. corresponds to more than one variants, we'll be storing one
-#   row per variant in the output VCF file.
+#   entries, i.e. corresponds to more than one variants, each variant is looked up
+#   separately and the row is written once, with one GENE value per ALT value
+#   (a |-separated list of gene symbols, or . if none were found).
+#   With -s we'll be storing one row per variant in the output VCF file instead,
+#   each with a comma-separated list of gene symbols for that variant.
 #
 # It uses the following modules:
-# pyVCF (http://pyvcf.readthedocs.io/en/latest/) 
 # variantapi.client (https://github.com/saphetor/variant-api-client-python)
+# variantapi.vcfio, a streaming VCF reader/writer that only decodes the columns
+#   needed for the lookups and copies all other columns through unchanged.
+#   Plain, gzip and bgzip compressed VCF files are supported.
 
 import argparse
 import json
 import logging
-import vcf
+import multiprocessing
+import os
 import re
+import shutil
 import sys
+import tempfile
 from sys import argv
+from variantapi.cache import SQLiteCache
 from variantapi.client import VariantAPIClient
-from vcf.parser import _Info as VcfInfo, field_counts as vcf_field_counts
+from variantapi.pipeline import run_pipeline
+from variantapi.projection import Projection
+from variantapi.vcfio import VCFReader, VCFRecord, VCFWriter, iter_shard, plan_shards, remove_info_value, set_info_value
 
 __author__ = 'stephanos-androutsellis'
 
 # Declare reference genome as a global variable
 _ref_genome = 1019
 
-# Declare the limit of variants we want to lookup in each batch request
-_batch_limit = 3 
+# Declare the default limit of variants we want to lookup in each batch request
+_batch_limit = 1000
 
+# Declare the number of single lookups run concurrently when not doing batch requests
+_lookup_workers = 8
 
-# A class to store variant lookup data:
-# - The record from the input VCF file
-# - The variant string
+# Declare the parts of the API responses we need: the gene symbols of the first refseq and ensembl transcripts.
+# Only the source databases needed for them are requested, and everything else is dropped from the responses.
+_gene_projection = Projection([
+	'refseq_transcripts[0].items[].gene_symbol',
+	'ensembl_transcripts[0].items[].gene_symbol',
+])
+
+
+# Chromosome names read from the input VCF file. Variant_lookup_data objects store the position of their
+# chromosome name in this list instead of a string of their own.
+_chromosomes = []
+_chromosome_indexes = {}
+
+
+def chromosome_index(chrom):
+	index = _chromosome_indexes.get(chrom)
+	if (index is None):
+		index = _chromosome_indexes[chrom] = len(_chromosomes)
+		_chromosomes.append(chrom)
+	return index
+
+
+# A class to store variant lookup data, kept compact as many of them wait for each batch request:
+# - The raw line of the record from the input VCF file (shared by all ALT values of the record), rather than a
+#   parsed record, so that no decoded columns are kept alive while a batch waits on the network
+# - The chromosome index, position and REF value
 # - The corresponding ALT value (convenient for multi-variant records)
+# The variant string and the VCF record are rebuilt from these when needed.
 class Variant_lookup_data(object):
-    vcf_record = None
-    variant_string = ""
-    alt_value = ""
+    __slots__ = ('line', 'chrom_index', 'pos', 'ref', 'alt_value')
 
     # The class constructor/initializer 
-    def __init__(self,vcf_record,variant_string,alt_value):
-        self.vcf_record=vcf_record
-        self.variant_string=variant_string
+    def __init__(self,line,chrom_index,pos,ref,alt_value):
+        self.line=line
+        self.chrom_index=chrom_index
+        self.pos=pos
+        self.ref=ref
         self.alt_value=alt_value
 
+    @property
+    def variant_string(self):
+        # Concatenate chromosome, position, reference and alternative, separated by ":" characters
+        return "{}:{}:{}:{}".format(
+            _chromosomes[self.chrom_index], self.pos, self.ref, self.alt_value if self.alt_value is not None else "")
+
+    @property
+    def vcf_record(self):
+        return VCFRecord(self.line)
+
+
+# Reads the records of the input VCF file and groups the Variant_lookup_data objects generated for them,
+# so that each group can be looked up with a single batch request.
+# Input:
+#    vcf_reader: The input VCF file reader object
+#    batch_limit: A function returning the number of variants a group should (at least) contain. A group may
+#        slightly cross the limit if the last record read contained more than one variants. This is OK.
+# Output:
+#    Iterating yields lists of Variant_lookup_data objects. total_counter holds the number of rows read.
+class Variant_lookup_batches(object):
+
+    def __init__(self, vcf_reader, batch_limit):
+        self.vcf_reader = vcf_reader
+        self.batch_limit = batch_limit
+        self.total_counter = 0
+
+    def __iter__(self):
+        variant_lookup_data_array = []
+        for vcf_record in self.vcf_reader:
+            # A vcf_record (i.e. row in the VCF file) may correspond to more than one variants, if it contains
+            # more than one ALT values. We generate a Variant_lookup_data record for each variant.
+            # Note: The raw line of the same "vcf_record" will be referenced by each Variant_lookup_data record,
+            #       however the "alt_value" field will contain a different ALT value.
+            variant_lookup_data_from_vcf_record(vcf_record, variant_lookup_data_array)
+
+            self.total_counter += 1
+            if (self.total_counter % 1000 == 0):
+                print ("Read ", self.total_counter, " rows")
+
+            if (len(variant_lookup_data_array) >= self.batch_limit()):
+                yield variant_lookup_data_array
+                variant_lookup_data_array = []
+
+        # Reached end of input VCF file
+        if (variant_lookup_data_array):
+            yield variant_lookup_data_array
+
+
+# Sends the log messages of the client (e.g. retried requests) to stderr. The client itself leaves the
+# configuration of logging to the application.
+# Input:
+#    None
+# Output:
+#    None
+def configure_logging():
+	logging.basicConfig(level=logging.INFO)
+
 
 def main(argv):
+	configure_logging()
+
 	# Read and parse arguments
 	infile = ''
 	outfile = ''
@@ -65,103 +160,167 @@ def main(argv):
 	parser.add_argument('-k', help='Your key to the API', type=str, metavar='API Key', required=False)
 	parser.add_argument('-g', help='Reference genome either 1019 (default) or 1038', type=int, 
 		metavar='Reference Genome', required=False, default=1019)
-	parser.add_argument('-nb', help="Do not do batch requests", action='store_true')
+	parser.add_argument('-nb', help="Do not do batch requests, look variants up one by one (several at a time) "
+		"instead. No API key is needed for this", action='store_true')
+	parser.add_argument('-n', help='Maximum number of variants per batch request', type=int,
+		metavar='Batch size', required=False, default=_batch_limit)
+	parser.add_argument('-t', help='Tune the batch size (up to -n) so that a request takes about this many seconds',
+		type=float, metavar='Target Latency', required=False)
+	parser.add_argument('-w', help='Number of lookups to run concurrently. With more than 1, reading the input, '
+		'executing lookups and writing the output are pipelined', type=int, metavar='Workers', required=False, default=1)
+	parser.add_argument('-P', help='Number of processes annotating shards of the input in parallel', type=int,
+		metavar='Processes', required=False, default=1)
+	parser.add_argument('-s', help='Write one row per ALT value of multi-allelic rows', action='store_true')
+	parser.add_argument('-c', help='Annotation cache file. Variants found in it are not looked up again', type=str,
+		metavar='Cache File', required=False)
 
 	args = parser.parse_args()
+	if (args.P > 1 and args.c):
+		# Each process would write to the SQLite cache at the same time, which fails with "database is locked"
+		parser.error('a cache file (-c) can not be used with several processes (-P)')
 	infile = args.i
 	outfile = args.o
-	api_key = args.k
-	ref_genome = args.g if args.g is not None else _ref_genome
-	do_batch_lookups = not args.nb
+	processes = args.P
+
+	# Options for annotate_records. They are passed on to the worker processes in sharded mode, so each process
+	# can set up its own API client.
+	options = {
+		'api_key': args.k,
+		'ref_genome': args.g if args.g is not None else _ref_genome,
+		'do_batch_lookups': not args.nb,
+		'batch_size': args.n,
+		'target_latency': args.t,
+		'workers': args.w,
+		'cache_file': args.c,
+		'split_alleles': args.s,
+	}
 
 	# Open and load vcf file into vfc reader object
 	print ("Reading input file ", infile)
-	vcf_reader = vcf.Reader(filename=infile, encoding='utf8')
+	vcf_reader = VCFReader(infile)
 
 	# Add a new GENE info field in the metadata description, so that we may store such data for each record
-	vcf_reader.infos['GENE'] = VcfInfo( 'GENE', ".", 'String', 'Concatenated list of GENE sumbols',"","")
+	if (args.s):
+		vcf_reader.header.add_info('GENE', '.', 'String', 'Concatenated list of GENE sumbols')
+	else:
+		vcf_reader.header.add_info('GENE', 'A', 'String', 'GENE symbols of each ALT allele, separated by |')
 	
 	# Prepare output for writing.
 	print ("Opening output file ", outfile)
-	vcf_writer = vcf.Writer(open(outfile, 'w'), vcf_reader, lineterminator='\n')
+	vcf_writer = VCFWriter(outfile, vcf_reader.header)
 
-	# Declare an array of Variant_lookup_data objects to hold data for executing the
-	# lookups and process its outcome.
-	variant_lookup_data_array = []
+	print("Start parsing input file")
+
+	if (processes > 1):
+		shards = plan_shards(infile, processes * 4)
+		if (len(shards) < 2):
+			# e.g. a compressed file without a tabix/CSI index, or with a single chromosome in it
+			print ("Warning: ", infile, " can not be split into shards, annotating it in a single process",
+				file=sys.stderr)
+			processes = 1
+
+	if (processes > 1):
+		# Sharded mode: split the input into shards (by byte range for plain VCF files, by chromosome for bgzip
+		# compressed files with a tabix/CSI index), annotate the shards in a pool of processes, each writing a
+		# temporary file, and merge the temporary files into the output in input order.
+		vcf_reader.close()
+		print ("Annotating ", len(shards), " shards in ", processes, " processes")
+		shard_dir = tempfile.mkdtemp(prefix='shards-', dir=os.path.dirname(os.path.abspath(outfile)))
+		tasks = [(infile, shard, os.path.join(shard_dir, '{}.vcf'.format(i)), options) for i, shard in enumerate(shards)]
+		try:
+			pool = multiprocessing.Pool(processes, initializer=configure_logging)
+			try:
+				stats = pool.map(annotate_shard, tasks, chunksize=1)
+			finally:
+				pool.close()
+				pool.join()
+			for task in tasks:
+				vcf_writer.append_file(task[2])
+		finally:
+			shutil.rmtree(shard_dir)
+		total_counter, cache_hits, cache_misses = [sum(values) for values in zip(*stats)]
+	else:
+		total_counter, cache_hits, cache_misses = annotate_records(vcf_reader, vcf_writer, options)
+		vcf_reader.close()
+
+	vcf_writer.close()
+	print ("Finished reading ", total_counter, " rows, exiting")
+	if options['cache_file']:
+		print ("Cache hits: ", cache_hits, ", misses: ", cache_misses)
 
-	# A counter for the total number of rows processed thus far
-	total_counter = 0
 
-	# Initialize client connection to API
-	api = VariantAPIClient(api_key)
+# Annotates VCF records and writes them in the output VCF file
+# Input:
+#    vcf_records: An iterable of records read from the input VCF file
+#    vcf_writer: The output VCF file handler object
+#    options: A dictionary with the API client and lookup options parsed in main
+# Output:
+#    A (number of rows read, cache hits, cache misses) tuple
+def annotate_records(vcf_records, vcf_writer, options):
+	ref_genome = options['ref_genome']
+	do_batch_lookups = options['do_batch_lookups']
+	workers = options['workers']
+	cache = SQLiteCache(options['cache_file']) if options['cache_file'] else None
+
+	# Initialize client connection to API, with a keep-alive connection for every request that may run at once
+	pool_size = workers if do_batch_lookups else workers * _lookup_workers
+	api = VariantAPIClient(options['api_key'], batch_size=options['batch_size'], cache=cache,
+		target_latency=options['target_latency'], lookup_workers=_lookup_workers, pool_size=pool_size)
 	if (api is None):
 		print("Failed to connect to API")
 		sys.exit()
 
-	print("Start parsing input file")
+	# Group the records read from the input VCF file: one group per batch request, or, when performing individual
+	# lookups, enough variants to keep all concurrent single lookups busy.
+	# The batch limit follows the client's batch size, which may be tuned from the latency of earlier requests.
+	if (do_batch_lookups):
+		batch_limit = lambda: api.current_batch_size
+	else:
+		batch_limit = lambda: 4 * _lookup_workers
+	batches = Variant_lookup_batches(vcf_records, batch_limit)
+
+	# Execute the lookups for a group; returns the group together with the response data for each variant
+	def lookup(variant_lookup_data_array):
+		return variant_lookup_data_array, lookup_variants(api, variant_lookup_data_array, ref_genome, do_batch_lookups)
+
+	# Process the responses variant by variant (with split_alleles) or row by row, writing the records in the
+	# output vcf file. All variants of a row are in the same group, next to each other.
+	def write(batch_result):
+		if (options['split_alleles']):
+			for variant_lookup_data, data in zip(*batch_result):
+				process_single_variant_response_data(variant_lookup_data, data, vcf_writer)
+			return
+		variant_lookup_data_array, batch_data = batch_result
+		start = 0
+		for end in range(1, len(variant_lookup_data_array) + 1):
+			if (end == len(variant_lookup_data_array) or
+					variant_lookup_data_array[end].line is not variant_lookup_data_array[start].line):
+				process_row_response_data(variant_lookup_data_array[start:end], batch_data[start:end], vcf_writer)
+				start = end
+
+	if (workers > 1):
+		# Pipelined mode: a reader thread parses the input, worker threads execute lookups concurrently and this
+		# thread writes the results in input order, so parsing, lookups and writing all overlap.
+		run_pipeline(batches, lookup, write, workers=workers)
+	else:
+		for variant_lookup_data_array in batches:
+			write(lookup(variant_lookup_data_array))
 
-	# Iterate throught all the records read from the input VCF file
-	while True:
-		try: 
-			# Get next record (corresponds to a data row in the file)
-			vcf_record = next(vcf_reader)
-
-			# A vcf_record (i.e. row in the VCF file) may correspond to more than one variants, if it contains 
-			# more than one ALT values. We generate a Variant_lookup_data record for each variant,
-			# and add them to the variant_lookup_data_array. 
-			# Note: A reference to the same "vcf_record" object will be stored in each Variant_lookup_data record,
-			#       however the "alt" field will contain a different ALT value.
-			variant_lookup_data_from_vcf_record(vcf_record, variant_lookup_data_array)
-
-		except StopIteration as e:
-			# Reached end of input VCF file, no new vcf_record was read
-			vcf_record = None
-
-		# If we are performing batch lookups...
-		if (do_batch_lookups):
-			# Check if we have reached (or slightly crossed) the limit of variants we want for the batch request, or the end of the input file.
-			# Note: In this implementation we may cross the limit if the last vcf_record read contained more than one variants. This is OK.
-			if (len(variant_lookup_data_array) >= _batch_limit or vcf_record is None):
-				# Extract variant strings from array.
-				variant_string_array = [vld.variant_string for vld in variant_lookup_data_array]
-
-				# Execute batch lookup request
-				batch_data = api.batch_lookup(variant_string_array, ref_genome=ref_genome, params={ 'add-all-data': 1 })
-		
-				# Process response, variant by variant
-				batch_counter = 0
-				for data in batch_data:
-					process_single_variant_response_data(variant_lookup_data_array[batch_counter], data, vcf_writer)
-					batch_counter += 1
-		
-				# Clear array
-				del variant_lookup_data_array[:]
-
-				if (vcf_record is None):
-					# Reached the end of the file, finish
-					break
-
-		# If we are performing individual lookups for each variant (which is not recommended for performance issues), 
-		# execute the lookup and process the outcome
-		else: 
-			if (vcf_record is not None):
-				# Execute lookup requests for each element in the array
-				for vld in variant_lookup_data_array:
-					data = api.lookup(vld.variant_string, ref_genome=ref_genome)
-					process_single_variant_response_data(vld, data, vcf_writer)
-
-				# Clear array
-				del variant_lookup_data_array[:]
-			else:
-				# Reached the end of the file, finish
-				break
-
-		total_counter += 1 
-		if (total_counter % 1000 == 0):
-			print ("Read ", total_counter, " rows")
+	if cache is not None:
+		cache.close()
+		return batches.total_counter, cache.hits, cache.misses
+	return batches.total_counter, 0, 0
 
-	print ("Finished reading ", total_counter, " rows, exiting")
 
+# Annotates a single shard of the input VCF file in a worker process, writing the records in a temporary file
+# Input:
+#    task: An (input file, shard, temporary output file, options) tuple
+# Output:
+#    The output of annotate_records
+def annotate_shard(task):
+	infile, shard, shard_file, options = task
+	with VCFWriter(shard_file) as vcf_writer:
+		return annotate_records(iter_shard(infile, shard), vcf_writer, options)
 
 
 # Processes a vcf_record from the input VCF file, creates Variant_lookup_data objects for the variants
@@ -173,35 +332,52 @@ def main(argv):
 # Output:
 #    None as such, but new elements are appended to the input array variant_lookup_data_array
 def variant_lookup_data_from_vcf_record(vcf_record, variant_lookup_data_array):
-	# Concatenate chromosome, position and reference, separated by ":" characters
-	variant_chromposref = vcf_record.CHROM + ":" + str(vcf_record.POS) + ":"
-	if (vcf_record.REF is not None):
-		variant_chromposref += str(vcf_record.REF)
-	variant_chromposref += ":"
-	
-	# For each ALT element, generate a new string and append to the array
-	if (vcf_record.ALT is not None):
+	chrom_index = chromosome_index(vcf_record.CHROM)
+	pos = vcf_record.POS
+	ref = vcf_record.REF
+
+	# For each ALT element, generate a new Variant_lookup_data object and append to the array
+	if (vcf_record.ALT):
 		for alt in vcf_record.ALT:
-			variant_string = variant_chromposref + str(alt)
-			variant_lookup_data = Variant_lookup_data(vcf_record,variant_string,alt)
+			variant_lookup_data = Variant_lookup_data(vcf_record.line,chrom_index,pos,ref,alt)
 			variant_lookup_data_array.append(variant_lookup_data)
 	else:
-		variant_lookup_data = Variant_lookup_data(vcf_record,variant_chromposref,vcf_record.ALT)
+		variant_lookup_data = Variant_lookup_data(vcf_record.line,chrom_index,pos,ref,None)
 		variant_lookup_data_array.append(variant_lookup_data)
 
 
-# Processes a single variant description vcf_record and writes the resulting new record in the output VCF file
+# Executes the lookups for a group of variants
 # Input:
-#  variant_lookup_data: A Variant_lookup_data object corresponding to the variant being queried.
-#  response_data: The data received from the variant API for this specific record. Note that if the record contained more than one
-#        elements in the ALT field, and thus corresponded to more than one variants, we query the variant API once for each 
-#        variant. 
-#  vcf_writer: The output VCF file handler object
+#    api: The variant API client
+#    variant_lookup_data_array: An array of Variant_lookup_data objects to look up
+#    ref_genome: The reference genome
+#    do_batch_lookups: Whether to use a single batch request or one request per variant
 # Output:
-#    None
-def process_single_variant_response_data(variant_lookup_data, response_data, vcf_writer):
-	# Try to extract the gene_data information from the response
+#    An array with the response data for each element of variant_lookup_data_array
+def lookup_variants(api, variant_lookup_data_array, ref_genome, do_batch_lookups):
+	# Extract variant strings from array. Rows without ALT values are not looked up, and variants
+	# the api would not accept (e.g. symbolic ALT values like <DEL>) are rejected locally instead of
+	# failing the whole batch.
+	variant_string_array = [vld.variant_string for vld in variant_lookup_data_array if vld.alt_value is not None]
+
+	if (do_batch_lookups):
+		response_data = api.batch_lookup(variant_string_array, ref_genome=ref_genome, projection=_gene_projection, validate=True)
+	else:
+		response_data = api.lookup_many(variant_string_array, ref_genome=ref_genome, projection=_gene_projection, validate=True)
+
+	response_data = iter(response_data)
+	return [next(response_data) if vld.alt_value is not None else None for vld in variant_lookup_data_array]
+
+
+# Extracts the gene symbols of the transcripts in the data received from the variant API for a variant
+# Input:
+#  response_data: The data received from the variant API for a variant
+# Output:
+#    A sorted list of gene symbols
+def gene_symbols_from_response_data(response_data):
 	gene_symbols = set()
+	if not response_data:
+		return []
 	if 'refseq_transcripts' in response_data.keys() and response_data['refseq_transcripts']:
 		for t in response_data['refseq_transcripts'][0]['items']:
 			if 'gene_symbol' in t and t['gene_symbol']:
@@ -210,19 +386,68 @@ def process_single_variant_response_data(variant_lookup_data, response_data, vcf
 		for t in response_data['ensembl_transcripts'][0]['items']:
 			if 'gene_symbol' in t and t['gene_symbol']:
 				gene_symbols.add(t['gene_symbol'])
+	return sorted(gene_symbols)
+
+
+# Processes a single variant description vcf_record and writes the resulting new record in the output VCF file
+# Input:
+#  variant_lookup_data: A Variant_lookup_data object corresponding to the variant being queried.
+#  response_data: The data received from the variant API for this specific record. Note that if the record contained more than one
+#        elements in the ALT field, and thus corresponded to more than one variants, we query the variant API once for each 
+#        variant. 
+#  vcf_writer: The output VCF file handler object
+# Output:
+#    None
+def process_single_variant_response_data(variant_lookup_data, response_data, vcf_writer):
+	# Try to extract the gene_data information from the response
+	gene_symbols = gene_symbols_from_response_data(response_data)
 
+	vcf_record = variant_lookup_data.vcf_record
 	if gene_symbols:
 		# Concatenate all gene symbols into a comma-separated string
 		gene_str = ','.join(gene_symbols)
 
 		# Add gene entry in the INFO field, containing the string.
-		variant_lookup_data.vcf_record.INFO['GENE'] = gene_str
+		info = set_info_value(vcf_record.INFO, 'GENE', gene_str)
+	else:
+		# Remove a GENE entry the input may already contain, it does not belong to this variant
+		info = remove_info_value(vcf_record.INFO, 'GENE')
+
+	# Use the correct ALT value for this variant. The shared vcf_record itself is left untouched, so
+	# the line written for one ALT value never carries the GENE entry of another one.
+	alt = [variant_lookup_data.alt_value] if variant_lookup_data.alt_value is not None else []
+
+	# Write the record in the output vcf file. Columns other than ALT and INFO are copied unchanged.
+	vcf_writer.write_line(vcf_record.format(alt=alt, info=info))
+
+
+# Processes all variants of a row of the input VCF file and writes the row once in the output VCF file, with a
+# GENE value for each ALT value (Number=A)
+# Input:
+#  variant_lookup_data_array: The Variant_lookup_data objects of the row, in ALT order
+#  response_data_array: The data received from the variant API for each of them
+#  vcf_writer: The output VCF file handler object
+# Output:
+#    None
+def process_row_response_data(variant_lookup_data_array, response_data_array, vcf_writer):
+	vcf_record = variant_lookup_data_array[0].vcf_record
+
+	# Rows without ALT values have no Number=A values to store. A GENE entry the input may already contain is
+	# removed (and replaced in all other rows), it does not belong to the variants looked up.
+	if (variant_lookup_data_array[0].alt_value is None):
+		vcf_writer.write_line(vcf_record.format(info=remove_info_value(vcf_record.INFO, 'GENE')))
+		return
+
+	# Gene symbols of a variant are separated by "|", as "," separates the values of the ALT values
+	gene_values = []
+	for response_data in response_data_array:
+		gene_symbols = gene_symbols_from_response_data(response_data)
+		gene_values.append('|'.join(gene_symbols) if gene_symbols else '.')
 
-	# Assign the correct ALT value to the vcf_record for this variant.
-	variant_lookup_data.vcf_record.ALT = [variant_lookup_data.alt_value]
+	info = set_info_value(vcf_record.INFO, 'GENE', ','.join(gene_values))
 
-	# Write the record in the output vcf file.
-	vcf_writer.write_record(variant_lookup_data.vcf_record)
+	# Write the record in the output vcf file. Columns other than INFO are copied unchanged.
+	vcf_writer.write_line(vcf_record.format(info=info))
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import argparse
 import json
+import logging
 import sys
 
 from variantapi.client import VariantAPIClient
@@ -8,6 +9,7 @@ from variantapi.client import VariantAPIClient
 __author__ = 'ckopanos, Leopold von Seckendorff'
 
 def main(argv):
+    logging.basicConfig(level=logging.INFO)
     parser = argparse.ArgumentParser(description='Sample Variant API calls')
     parser.add_argument(
         '-k',
@@ -62,12 +64,15 @@ def main(argv):
                     params=request_parameters,
                     ref_genome=ref_genome
                     )
+    elif api_key is None:
+        # batch requests need an api key, look the queries up one by one
+        # (concurrently) instead
+        result = api.lookup_many(
+                    query,
+                    params=request_parameters,
+                    ref_genome=ref_genome
+                    )
     else:
-        if api_key is None:
-            sys.exit(
-                'You need to pass an api key to perform batch requests. '
-                'consider using batchRequestClient.py for large batch lookups'
-                )
         result = api.batch_lookup(
                     query,
                     params=request_parameters,
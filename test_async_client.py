@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from benchmarks.mock_server import MockVarsomeServer
+from variantapi.client import VarsomeHTTPError
+
+try:
+    import aiohttp
+    from variantapi.async_client import AsyncVariantAPIClient
+except ImportError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncVariantAPIClient(unittest.TestCase):
+    """runs the asyncio client against the local mock api"""
+
+    def setUp(self):
+        self.server = MockVarsomeServer().start()
+        self.variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 125)]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_client(self, coroutine_function, **kwargs):
+        async def run():
+            async with AsyncVariantAPIClient(
+                    api_url=self.server.url, **kwargs) as api:
+                return await coroutine_function(api)
+        return asyncio.run(run())
+
+    def test_lookup(self):
+        async def lookup_all(api):
+            return await asyncio.gather(
+                *[api.lookup(v) for v in self.variants])
+        results = self.run_client(lookup_all)
+        self.assertEqual(
+            [r['pos'] for r in results], list(range(100, 125)))
+
+    def test_batch_lookup(self):
+        # smaller chunks are answered sooner, the last one first
+        self.server.latency_per_variant = 0.002
+        results = self.run_client(
+            lambda api: api.batch_lookup(self.variants),
+            api_key='key', batch_size=4)
+        self.assertEqual(
+            [r['pos'] for r in results], list(range(100, 125)))
+        self.assertEqual(self.server.statuses, {200: 7})
+
+    def test_errors(self):
+        with self.assertRaises(VarsomeHTTPError) as e:
+            self.run_client(lambda api: api.batch_lookup(self.variants))
+        self.assertEqual(e.exception.status, 401)
+
+        self.server.bad_queries = {'chr1:110:A:T'}
+        with self.assertRaises(VarsomeHTTPError) as e:
+            self.run_client(
+                lambda api: api.batch_lookup(self.variants),
+                api_key='key', batch_size=4)
+        self.assertEqual(e.exception.status, 400)
+        with self.assertRaises(VarsomeHTTPError) as e:
+            self.run_client(lambda api: api.lookup('chr1:110:A:T'))
+        self.assertEqual(e.exception.status, 400)
+
+    def test_max_concurrency(self):
+        self.server.latency = 0.02
+
+        async def lookup_all(api):
+            return await asyncio.gather(
+                *[api.lookup(v) for v in self.variants])
+        self.run_client(lookup_all, max_concurrency=3)
+        self.assertEqual(self.server.statuses, {200: 25})
+        self.assertEqual(self.server.max_in_flight, 3)
+
+        self.server.reset()
+        self.run_client(
+            lambda api: api.batch_lookup(self.variants),
+            api_key='key', batch_size=2, max_concurrency=4)
+        self.assertEqual(self.server.statuses, {200: 13})
+        self.assertEqual(self.server.max_in_flight, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
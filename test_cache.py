@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from variantapi.cache import LRUCache
+from variantapi.cache import SQLiteCache
+
+
+class TestSQLiteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_key_normalisation(self):
+        self.assertEqual(
+            SQLiteCache.make_key(' rs113488022\n', 'hg19', {'b': 1, 'a': '2'}),
+            SQLiteCache.make_key('rs113488022', 'hg19', {'a': 2, 'b': '1'})
+            )
+        self.assertNotEqual(
+            SQLiteCache.make_key('rs113488022', 'hg19'),
+            SQLiteCache.make_key('rs113488022', 'hg38')
+            )
+
+    def test_hits_and_misses(self):
+        cache = SQLiteCache(self.path)
+        cache.set('a', {'variant_id': '1'})
+        self.assertEqual(cache.get('a'), {'variant_id': '1'})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+        # entries survive reopening the database
+        cache = SQLiteCache(self.path)
+        self.assertEqual(cache.get_many(['a', 'b']), {'a': {'variant_id': '1'}})
+        cache.close()
+
+    def test_ttl(self):
+        cache = SQLiteCache(self.path, ttl=0.01)
+        cache.set('a', [1])
+        time.sleep(0.05)
+        self.assertIsNone(cache.get('a'))
+        cache.close()
+
+    def test_size_eviction(self):
+        cache = SQLiteCache(self.path, max_entries=2)
+        cache.set('a', 1)
+        time.sleep(0.01)
+        cache.set('b', 2)
+        time.sleep(0.01)
+        cache.get('a')
+        time.sleep(0.01)
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+        cache.close()
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        cache.get_or_compute('a', lambda: None)
+        cache.get_or_compute('c', lambda: 3)
+        self.assertEqual(cache.get_or_compute('a', lambda: None), 1)
+        self.assertEqual(cache.get_or_compute('b', lambda: 4), 4)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_coalescing(self):
+        cache = LRUCache(10)
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait()
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute('k', compute))
+                )
+            for _ in range(5)
+            ]
+        for t in threads:
+            t.start()
+        while cache.misses + cache.coalesced < 5:
+            time.sleep(0.001)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_errors_are_not_cached(self):
+        cache = LRUCache(10)
+        with self.assertRaises(ValueError):
+            cache.get_or_compute('k', lambda: int('x'))
+        self.assertEqual(cache.get_or_compute('k', lambda: 1), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from variantapi.checkpoint import CheckpointError
+from variantapi.checkpoint import CheckpointedBatchJob
+from variantapi.metrics import ClientMetrics
+
+
+class FakeClient(object):
+    """stands in for VariantAPIClient, fails after a number of chunks"""
+    batch_size = 2
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.posted = []
+        self.metrics = ClientMetrics()
+
+    def _map_ordered(self, func, items):
+        for item in items:
+            yield func(item)
+
+    def _lookup_chunk(self, chunk, params, ref_genome):
+        if self.fail_after is not None and len(self.posted) >= self.fail_after:
+            raise RuntimeError('connection lost')
+        self.posted.append(chunk)
+        return [{'query': v} for v in chunk]
+
+
+class TestCheckpointedBatchJob(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.journal = os.path.join(self.tmpdir, 'job.journal')
+        self.variants = ['rs{}\n'.format(i) for i in range(7)]
+        self.expected = [{'query': 'rs{}'.format(i)} for i in range(7)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume(self):
+        job = CheckpointedBatchJob(FakeClient(fail_after=2), self.journal)
+        with self.assertRaises(RuntimeError):
+            job.run(self.variants)
+
+        client = FakeClient()
+        job = CheckpointedBatchJob(client, self.journal)
+        self.assertEqual(job.run(self.variants), self.expected)
+        self.assertEqual(client.posted, [['rs4', 'rs5'], ['rs6']])
+        self.assertEqual((job.skipped_chunks, job.completed_chunks), (2, 2))
+
+        # a finished job is answered from the journal alone
+        client = FakeClient()
+        job = CheckpointedBatchJob(client, self.journal)
+        self.assertEqual(job.run(self.variants), self.expected)
+        self.assertEqual(client.posted, [])
+
+    def test_truncated_journal(self):
+        CheckpointedBatchJob(FakeClient(), self.journal).run(self.variants)
+        with open(self.journal, 'rb+') as f:
+            f.truncate(os.path.getsize(self.journal) - 5)
+
+        client = FakeClient()
+        job = CheckpointedBatchJob(client, self.journal)
+        self.assertEqual(job.run(self.variants), self.expected)
+        self.assertEqual(client.posted, [['rs6']])
+
+    def test_changed_parameters(self):
+        CheckpointedBatchJob(FakeClient(), self.journal).run(self.variants)
+        job = CheckpointedBatchJob(FakeClient(), self.journal, ref_genome='hg38')
+        with self.assertRaises(CheckpointError):
+            job.run(self.variants)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,14 @@
+import json
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from benchmarks.mock_server import MockVarsomeServer
+from variantapi.cache import SQLiteCache
 from variantapi.client import VariantAPIClient
 from variantapi.client import VarsomeHTTPError
+from variantapi.projection import Projection
 
 # produces a lot of ResourceWarnings from Requests
 # production code runs fine, so we can ignore
@@ -73,5 +81,226 @@ class TestAPIOutput(unittest.TestCase):
               'variant_type': 'Deletion (homopolymer)'}]
             )
 
+
+class FakeBatchClient(VariantAPIClient):
+    """answers batch chunks locally and records what would be posted"""
+
+    def __init__(self, *args, **kwargs):
+        super(FakeBatchClient, self).__init__(*args, **kwargs)
+        self.posted = []
+
+    def _post_chunk(self, chunk, params, ref_genome):
+        self.posted.append(list(chunk))
+        return [
+            [{'query': v, 'n': 1}, {'query': v, 'n': 2}]
+                if ':c.' in v else {'query': v}
+            for v in chunk
+            ]
+
+
+class TestBatchDeduplication(unittest.TestCase):
+
+    def test_deduplicate(self):
+        api = FakeBatchClient(batch_size=2)
+        variants = [
+            'rs1', 'CCR5:c.*1712delG', 'rs1 ', 'rs2', 'CCR5:c.*1712delG'
+            ]
+        results = api.batch_lookup(variants, deduplicate=True)
+        self.assertEqual(api.posted, [['rs1', 'CCR5:c.*1712delG'], ['rs2']])
+        self.assertEqual(
+            results,
+            [{'query': 'rs1'},
+             [{'query': 'CCR5:c.*1712delG', 'n': 1},
+              {'query': 'CCR5:c.*1712delG', 'n': 2}],
+             {'query': 'rs1'},
+             {'query': 'rs2'},
+             [{'query': 'CCR5:c.*1712delG', 'n': 1},
+              {'query': 'CCR5:c.*1712delG', 'n': 2}]]
+            )
+
+
+class TestMockServer(unittest.TestCase):
+    """runs the client against the local mock api of the benchmarks"""
+
+    def setUp(self):
+        self.server = MockVarsomeServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_lookup_and_batch_lookup(self):
+        api = VariantAPIClient(
+            'key', api_url=self.server.url, batch_size=2,
+            compress_requests='gzip')
+        self.assertEqual(api.lookup('chr19:20082943:G:A')['pos'], 20082943)
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 105)]
+        results = api.batch_lookup(variants)
+        self.assertEqual([r['pos'] for r in results], list(range(100, 105)))
+        self.assertEqual(self.server.statuses, {200: 4})
+        self.assertEqual(api.metrics.variants, 6)
+
+    def test_iter_batch_lookup_of_a_file(self):
+        api = VariantAPIClient('key', api_url=self.server.url, batch_size=2)
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 105)]
+        results = list(api.iter_batch_lookup(v for v in variants))
+        self.assertEqual([r['pos'] for r in results], list(range(100, 105)))
+
+        with tempfile.NamedTemporaryFile('w', newline='') as f:
+            f.write(''.join(v + '\r\n' for v in variants))
+            f.flush()
+            with open(f.name, newline='') as lines:
+                results = list(api.iter_batch_lookup(lines))
+        self.assertEqual(
+            [(r['pos'], r['alt']) for r in results],
+            [(pos, 'T') for pos in range(100, 105)]
+            )
+        self.assertEqual(self.server.statuses, {200: 6})
+
+    def test_concurrent_chunks(self):
+        # smaller chunks are answered sooner, the last one first
+        self.server.latency_per_variant = 0.002
+        api = VariantAPIClient(
+            'key', api_url=self.server.url, batch_size=3, max_workers=3,
+            max_in_flight=5)
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 150)]
+        positions = []
+        for i, result in enumerate(api.iter_batch_lookup(variants)):
+            positions.append(result['pos'])
+            if i % api.batch_size == 0:
+                # a slow consumer, the workers run ahead of it
+                time.sleep(0.02)
+                started = (sum(self.server.statuses.values())
+                           + self.server.in_flight)
+                self.assertLessEqual(
+                    started, i // api.batch_size + api.max_in_flight)
+        self.assertEqual(positions, list(range(100, 150)))
+        self.assertEqual(self.server.statuses, {200: 17})
+        self.assertEqual(self.server.max_in_flight, api.max_workers)
+
+    def test_lookup_many(self):
+        api = VariantAPIClient(api_url=self.server.url)
+        api.keyless_rate_limit = None
+        queries = ['chr2:{}:G:C'.format(pos) for pos in range(1, 40)]
+        self.assertEqual(
+            [r['pos'] for r in api.lookup_many(queries)],
+            list(range(1, 40))
+            )
+        self.assertEqual(self.server.statuses, {200: 39})
+        # keyless lookup_many calls are throttled, nothing else
+        api = VariantAPIClient(api_url=self.server.url)
+        self.assertIsNone(api.rate_limiter)
+        start = time.time()
+        api.lookup_many(queries[:2 * api.keyless_rate_limit])
+        self.assertGreater(time.time() - start, 0.8)
+        self.assertEqual(
+            api._keyless_limiter.max_rate, api.keyless_rate_limit)
+        # cached results are not throttled
+        api.cache = SQLiteCache(':memory:')
+        api.lookup_many(queries[:5])
+        start = time.time()
+        api.lookup_many(queries[:5] * 10)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(api.cache.hits, 50)
+        self.assertIsNone(VariantAPIClient('key')._lookup_many_limiter())
+        self.assertIsNone(
+            VariantAPIClient(rate_limit=50)._lookup_many_limiter())
+
+    def test_validate(self):
+        api = VariantAPIClient('key', api_url=self.server.url, batch_size=2)
+        variants = ['1:100:A:T', 'chr1:100:A:<DEL>', 'chr1:200:CA:TA,G', 'x']
+        for results in (
+                api.batch_lookup(variants, validate=True),
+                api.batch_lookup(variants, deduplicate=True, validate=True),
+                list(api.iter_lookup_many(variants, validate=True)),
+                ):
+            self.assertEqual(results[0]['chromosome'], 'chr1')
+            self.assertEqual(results[1]['query'], 'chr1:100:A:<DEL>')
+            self.assertEqual(
+                [(r['pos'], r['ref'], r['alt']) for r in results[2]],
+                [(200, 'C', 'T'), (200, 'CA', 'G')]
+                )
+            self.assertIn('error', results[3])
+        # invalid variants are never sent
+        self.assertEqual(self.server.variants, 9)
+
+    def test_isolate_errors(self):
+        self.server.bad_queries = {'chr1:103:A:T', 'chr1:110:A:T'}
+        api = VariantAPIClient('key', api_url=self.server.url, batch_size=8)
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 112)]
+        with self.assertRaises(VarsomeHTTPError) as e:
+            api.batch_lookup(variants)
+        self.assertEqual(e.exception.status, 400)
+
+        results = api.batch_lookup(variants, isolate_errors=True)
+        self.assertEqual(
+            [r.get('pos', r.get('query')) for r in results],
+            list(range(100, 103)) + ['chr1:103:A:T']
+            + list(range(104, 110)) + ['chr1:110:A:T', 111]
+            )
+        self.assertTrue(results[3]['error'].startswith('400'))
+
+        api = VariantAPIClient(
+            'key', api_url=self.server.url, batch_size=8, target_latency=10)
+        api.batch_size_tuner.size = 8
+        results = api.batch_lookup(
+            variants, isolate_errors=True, projection=Projection(['pos']))
+        self.assertEqual(api.batch_size_tuner.errors, 0)
+        self.assertEqual(results[2], {'pos': 102})
+        self.assertEqual(results[3]['query'], 'chr1:103:A:T')
+        self.assertTrue(results[3]['error'].startswith('400'))
+
+    def test_isolate_errors_of_whole_chunks(self):
+        # an error of every variant is raised after a few requests
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 612)]
+        self.server.bad_queries = set(variants)
+        api = VariantAPIClient('key', api_url=self.server.url, batch_size=512)
+        with self.assertRaises(VarsomeHTTPError) as e:
+            api.batch_lookup(variants, isolate_errors=True)
+        self.assertEqual(e.exception.status, 400)
+        # the chunk, its parts, and both halves on the way down to the
+        # first variant of the first part (128 variants, 7 halvings)
+        self.assertEqual(
+            self.server.statuses, {400: 1 + api.isolation_parts + 2 * 7})
+
+    def test_isolate_errors_in_every_part(self):
+        variants = ['chr1:{}:A:T'.format(pos) for pos in range(100, 612)]
+        bad = [variants[i] for i in (0, 130, 300, 511)]
+        self.server.bad_queries = set(bad)
+        api = VariantAPIClient('key', api_url=self.server.url, batch_size=512)
+        results = api.batch_lookup(variants, isolate_errors=True)
+        self.assertEqual(len(results), len(variants))
+        for variant, result in zip(variants, results):
+            if variant in bad:
+                self.assertEqual(result['query'], variant)
+                self.assertTrue(result['error'].startswith('400'))
+            else:
+                self.assertEqual(result['pos'], int(variant.split(':')[1]))
+
+    def test_errors_and_retries(self):
+        with self.assertRaises(VarsomeHTTPError) as e:
+            VariantAPIClient(api_url=self.server.url).batch_lookup(['rs1'])
+        self.assertEqual(e.exception.status, 401)
+
+        self.server.error_rate = 1
+        api = VariantAPIClient(
+            'key', api_url=self.server.url, max_retries=2)
+        api.retry_policy.backoff = 0.001
+        with self.assertRaises(VarsomeHTTPError) as e:
+            api.batch_lookup(['rs1'])
+        self.assertEqual(e.exception.status, 503)
+        self.assertEqual(sum(api.metrics.retries.values()), 2)
+
+class TestImport(unittest.TestCase):
+
+    def test_import_has_no_side_effects(self):
+        # a fresh interpreter, this one imported requests already
+        report = subprocess.check_output([sys.executable, '-c', (
+            'import json, logging, sys, variantapi.client\n'
+            'print(json.dumps([\n'
+            '    [m for m in ("requests", "sqlite3") if m in sys.modules],\n'
+            '    len(logging.getLogger().handlers)]))\n'
+            )])
+        self.assertEqual(json.loads(report.decode('utf8')), [[], 0])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import pyarrow.parquet
+    from variantapi.columnar import Column, ParquetResultWriter
+except ImportError:
+    pyarrow = None
+
+
+RESULT = {
+    'chromosome': 'chr19',
+    'pos': 20082943,
+    'refseq_transcripts': [
+        {'items': [{'gene_symbol': 'ZNF93', 'coding_impact': {'a': 1}},
+                   {'gene_symbol': 'ZNF93'}]},
+        {'items': [{'gene_symbol': 'OTHER'}]},
+        ],
+    }
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestParquetResultWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'results.parquet')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_column(self):
+        genes = Column('genes=refseq_transcripts[0].items[].gene_symbol')
+        self.assertEqual(genes.name, 'genes')
+        self.assertEqual(genes.extract(RESULT), ['ZNF93', 'ZNF93'])
+        self.assertEqual(genes.extract({'pos': 1}), [])
+        self.assertEqual(
+            Column('refseq_transcripts.items.gene_symbol').extract(RESULT),
+            'ZNF93'
+            )
+        self.assertEqual(
+            Column('refseq_transcripts[0].items[0].coding_impact').extract(
+                RESULT),
+            '{"a": 1}'
+            )
+
+    def test_row_groups_and_types(self):
+        schema = {'chromosome': 'string', 'pos': {'type': 'integer'}}
+        results = [dict(RESULT, pos=p) for p in range(5)]
+        # a list result adds a row per variant
+        results.append([{'chromosome': 'chr1', 'pos': 7}, {'pos': 8}])
+        with ParquetResultWriter(
+                self.path,
+                ['chromosome', 'pos',
+                 'gene=refseq_transcripts[].items[].gene_symbol'],
+                schema=schema,
+                row_group_size=3) as writer:
+            writer.write_all(results)
+        self.assertEqual(writer.rows, 7)
+        self.assertEqual(writer.row_groups, 3)
+
+        table = pyarrow.parquet.read_table(self.path)
+        self.assertEqual(str(table.schema.field('pos').type), 'int64')
+        self.assertEqual(
+            str(table.schema.field('gene').type), 'list<element: string>')
+        self.assertEqual(
+            table.column('pos').to_pylist(), [0, 1, 2, 3, 4, 7, 8])
+        self.assertEqual(table.column('chromosome').to_pylist()[-1], None)
+        self.assertEqual(
+            table.column('gene').to_pylist()[0], ['ZNF93', 'ZNF93', 'OTHER'])
+        self.assertEqual(
+            writer.projection.params(),
+            {'add-source-databases': 'refseq-transcripts'}
+            )
+
+    def test_error_records(self):
+        with ParquetResultWriter(self.path, ['pos']) as writer:
+            writer.write_all(
+                [RESULT, {'query': 'chr1:1:A:<DEL>', 'error': 'invalid'}],
+                ['19:20082943:G:A', 'chr1:1:A:<DEL>']
+                )
+        table = pyarrow.parquet.read_table(self.path)
+        self.assertEqual(table.column('pos').to_pylist(), [20082943, None])
+        self.assertEqual(
+            table.column('query').to_pylist(),
+            ['19:20082943:G:A', 'chr1:1:A:<DEL>']
+            )
+        self.assertEqual(table.column('error').to_pylist(), [None, 'invalid'])
+        with self.assertRaises(ValueError):
+            ParquetResultWriter(self.path, ['error=pos'])
+
+    def test_empty(self):
+        ParquetResultWriter(self.path, ['pos']).close()
+        self.assertEqual(pyarrow.parquet.read_table(self.path).num_rows, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from variantapi.cache import LRUCache
+from variantapi.metrics import ClientMetrics
+from variantapi.metrics import Histogram
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_quantile(self):
+        h = Histogram(buckets=(1, 2, 4))
+        self.assertIsNone(h.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            h.observe(value)
+        self.assertEqual(h.count, 5)
+        self.assertEqual(h.sum, 16.5)
+        self.assertEqual(h.quantile(0.5), 1.75)
+        self.assertEqual(h.quantile(1), 4)
+        self.assertEqual(
+            h.cumulative(),
+            [(1, 1), (2, 3), (4, 4), (float('inf'), 5)]
+            )
+
+
+class TestClientMetrics(unittest.TestCase):
+
+    def test_records_and_summary(self):
+        metrics = ClientMetrics()
+        records = []
+        metrics.add_hook(records.append)
+        cache = LRUCache(10)
+        metrics.add_cache('response', cache)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('a', lambda: 1)
+
+        metrics.call_started()
+        metrics.record_response('POST', '/lookup/batch/hg19', 200, 0.2, 0.05,
+                                100, 400, 1000, 5000)
+        metrics.record_decode('POST', 0.01)
+        metrics.record_retry('POST')
+        metrics.record_error('GET', IOError('reset'))
+        metrics.record_call('POST', 0.3)
+        metrics.record_variants(2)
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].status, 200)
+        self.assertEqual(records[0].received_bytes, 1000)
+        self.assertEqual(metrics.histogram('request', 'POST').count, 1)
+        self.assertIsNone(metrics.histogram('request', 'GET'))
+
+        summary = metrics.summary()
+        self.assertEqual(summary['responses'], {'POST 200': 1})
+        self.assertEqual(summary['retries'], 1)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['variants'], 2)
+        self.assertEqual(summary['bytes']['received_uncompressed'], 5000)
+        self.assertEqual(
+            summary['caches'], {'response': {'hits': 1, 'misses': 1}})
+        self.assertEqual(summary['latency']['POST_decode']['count'], 1)
+
+        text = metrics.prometheus()
+        self.assertIn('# TYPE variantapi_request_seconds histogram', text)
+        self.assertIn(
+            'variantapi_request_seconds_bucket{method="POST",le="+Inf"} 1',
+            text)
+        self.assertIn(
+            'variantapi_responses_total{method="POST",status="200"} 1', text)
+        self.assertIn('variantapi_cache_hits_total{cache="response"} 1', text)
+        self.assertIn(
+            'variantapi_received_bytes_total{encoding="wire"} 1000', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.summary()['variants'], 0)
+        self.assertEqual(metrics.transfer.requests, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+from variantapi.ndjson import NDJSONWriter
+from variantapi.ndjson import iter_ndjson
+
+
+class TestNDJSON(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.results = [
+            {'variant_id': '10190030464171579001', 'chromosome': 'chr3'},
+            [{'variant_id': '10190040394788499002'},
+             {'variant_id': '10190040394653528001'}],
+            ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        for name in ('out.ndjson', 'out.ndjson.gz'):
+            path = os.path.join(self.tmpdir, name)
+            with NDJSONWriter(path) as writer:
+                offsets = [writer.write(r) for r in self.results]
+            self.assertEqual(writer.compressed, name.endswith('.gz'))
+            self.assertEqual(offsets[0], 0)
+            self.assertEqual(list(iter_ndjson(path)), self.results)
+
+    def test_one_compact_line_per_result(self):
+        path = os.path.join(self.tmpdir, 'out.ndjson')
+        with NDJSONWriter(path) as writer:
+            writer.write_all(self.results)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn(' ', lines[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from variantapi.normalise import (
+    InvalidVariantError, canonical_chromosome, normalise_variant)
+
+
+class TestNormalise(unittest.TestCase):
+
+    def test_chromosome_names(self):
+        for name in ('1', 'chr1', 'CHR1', '01'):
+            self.assertEqual(canonical_chromosome(name), 'chr1')
+        self.assertEqual(canonical_chromosome('x'), 'chrX')
+        self.assertEqual(canonical_chromosome('MT'), 'chrM')
+        self.assertEqual(canonical_chromosome('chrM'), 'chrM')
+        self.assertEqual(canonical_chromosome('GL000220.1'), 'GL000220.1')
+
+    def test_variants(self):
+        self.assertEqual(
+            normalise_variant(' 19:20082943:g:a\n'), ['chr19:20082943:G:A'])
+        self.assertEqual(
+            normalise_variant('chr19:20082943:1:G'), ['chr19:20082943:1:G'])
+        self.assertEqual(
+            normalise_variant('chr22:39777823::CAA'), ['chr22:39777823::CAA'])
+        # shared bases are trimmed from the end, then from the start
+        self.assertEqual(
+            normalise_variant('chr1:100:CTT:CGT'), ['chr1:101:T:G'])
+        self.assertEqual(
+            normalise_variant('chr1:100:CAA:C'), ['chr1:101:AA:'])
+        # deletions may be written without ALT bases
+        self.assertEqual(normalise_variant('chr1:100:aa:'), ['chr1:100:AA:'])
+        self.assertEqual(normalise_variant('chr1:100:2:'), ['chr1:100:2:'])
+        self.assertEqual(
+            normalise_variant('chrX:5:A:T,G'), ['chrX:5:A:T', 'chrX:5:A:G'])
+
+    def test_other_notations(self):
+        self.assertEqual(normalise_variant('RS113488022'), ['rs113488022'])
+        for query in ('BRAF:p.V600E', 'NM_000059.3:c.68_69delAG',
+                      'NM_004333.4(BRAF):c.1799T>A'):
+            self.assertEqual(normalise_variant(query), [query])
+
+    def test_invalid(self):
+        for query in ('', 'chr1:0:A:T', 'chr1:100:A:A', 'chr1:100::',
+                      'chr1:100:A:<DEL>', 'chr1:100:A', 'rs', 'BRAF V600E'):
+            with self.assertRaises(InvalidVariantError):
+                normalise_variant(query)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import random
+import time
+import unittest
+from variantapi.pipeline import run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_results_keep_source_order(self):
+        def process(item):
+            time.sleep(random.random() / 1000)
+            return item * 2
+
+        output = []
+        run_pipeline(range(200), process, output.append, workers=8)
+        self.assertEqual(output, [i * 2 for i in range(200)])
+
+    def test_pending_items_are_bounded(self):
+        read = []
+        written = []
+
+        def source():
+            for i in range(50):
+                read.append(i)
+                yield i
+
+        def sink(result):
+            # the reader holds one more item while waiting for a free slot
+            self.assertLessEqual(len(read) - len(written), 4 + 1)
+            written.append(result)
+
+        run_pipeline(source(), lambda i: i, sink, workers=2, max_pending=4)
+        self.assertEqual(written, list(range(50)))
+
+    def test_errors_are_raised(self):
+        def process(item):
+            if item == 5:
+                raise ValueError(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            run_pipeline(range(100), process, lambda result: None, workers=4)
+
+        def source():
+            yield 1
+            raise IOError('truncated input')
+
+        with self.assertRaises(IOError):
+            run_pipeline(source(), lambda i: i, lambda result: None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from variantapi.projection import Projection
+
+
+RESULT = {
+    'chromosome': 'chr19',
+    'pos': 20082943,
+    'gnomad_exomes': [{'ac': 1}],
+    'refseq_transcripts': [
+        {'items': [
+            {'gene_symbol': 'ZNF93', 'name': 'NM_031218.3'},
+            {'gene_symbol': 'ZNF93', 'name': 'NM_001365.1'},
+            ]},
+        {'items': [{'gene_symbol': 'OTHER'}]},
+        ],
+    }
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_extract(self):
+        projection = Projection([
+            'chromosome', 'refseq_transcripts[0].items[].gene_symbol'
+            ])
+        self.assertEqual(projection.extract(RESULT), {
+            'chromosome': 'chr19',
+            'refseq_transcripts': [
+                {'items': [{'gene_symbol': 'ZNF93'}, {'gene_symbol': 'ZNF93'}]}
+                ],
+            })
+
+    def test_shorter_path_keeps_whole_value(self):
+        projection = Projection(
+            ['refseq_transcripts[0].items', 'refseq_transcripts'])
+        self.assertEqual(
+            projection.extract(RESULT)['refseq_transcripts'],
+            RESULT['refseq_transcripts']
+            )
+
+    def test_list_results_and_missing_keys(self):
+        projection = Projection(
+            ['pos', 'ensembl_transcripts[0].items[].gene_symbol'])
+        self.assertEqual(
+            projection.extract([RESULT, {'pos': 1}]),
+            [{'pos': 20082943}, {'pos': 1}]
+            )
+
+    def test_params(self):
+        projection = Projection([
+            'chromosome', 'gnomad_exomes', 'refseq_transcripts[0].items'
+            ])
+        self.assertEqual(
+            projection.params(),
+            {'add-source-databases': 'gnomad-exomes,refseq-transcripts'}
+            )
+        self.assertEqual(
+            projection.params(
+                {'add-source-databases': 'all', 'expand-pubmed-articles': 0}),
+            {'add-source-databases': 'all', 'expand-pubmed-articles': 0}
+            )
+        self.assertEqual(Projection(['chromosome']).params(), {})
+
+    def test_invalid_path(self):
+        self.assertRaises(ValueError, Projection, ['refseq_transcripts[x]'])
+
+
+if __name__ == '__main__':
+    unittest.main()
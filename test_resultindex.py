@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from variantapi.ndjson import NDJSONWriter
+from variantapi.resultindex import ResultIndex, ResultIndexWriter, build_index
+
+
+def result(chromosome, pos):
+    return {
+        'chromosome': chromosome,
+        'pos': pos,
+        'variant_id': '{}-{}'.format(chromosome, pos),
+        }
+
+
+class TestResultIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'results.ndjson')
+        self.queries = ['2:300:A:T', 'chr1:200:A:T', 'bad', 'chr1:100:A:T',
+                        'BRAF:p.V600E']
+        self.results = [
+            result('chr2', 300), result('chr1', 200),
+            {'query': 'bad', 'error': 'unsupported'}, result('chr1', 100),
+            [result('chr7', 140453136), result('chr7', 140453137)],
+            ]
+        with NDJSONWriter(self.path) as out, \
+                ResultIndexWriter(self.path + '.idx') as index:
+            for query, r in zip(self.queries, self.results):
+                index.add(out.write(r), r, query)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_point_lookups(self):
+        with ResultIndex(self.path) as index:
+            for query, r in zip(self.queries, self.results):
+                self.assertEqual(index[query], r)
+            self.assertEqual(index.get('chr1-100'), self.results[3])
+            self.assertEqual(index.get('chr7-140453137'), self.results[4])
+            self.assertIsNone(index.get('chr1:101:A:T'))
+            self.assertNotIn('chr3-1', index)
+            with self.assertRaises(KeyError):
+                index['chr3-1']
+
+    def test_range(self):
+        with ResultIndex(self.path) as index:
+            self.assertEqual(
+                [r['pos'] for r in index.range('1', 100, 200)], [100, 200])
+            self.assertEqual(list(index.range('chr1', 101, 199)), [])
+            self.assertEqual(list(index.range('chr2')), [self.results[0]])
+            self.assertEqual(list(index.range('chr7')), [self.results[4]])
+            self.assertEqual(list(index.range('chrX')), [])
+
+    def test_build_index(self):
+        build_index(self.path)
+        with ResultIndex(self.path) as index:
+            self.assertEqual(index['chr2-300'], self.results[0])
+            self.assertEqual(index['bad'], self.results[2])
+            self.assertIsNone(index.get('2:300:A:T'))
+            self.assertEqual(index.positions, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
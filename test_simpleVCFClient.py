@@ -0,0 +1,136 @@
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from benchmarks.mock_server import MockVarsomeServer
+from variantapi.vcfio import VCFRecord
+import simpleVCFClient
+
+HEADER = (
+    '##fileformat=VCFv4.2\n'
+    '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+    )
+
+ROWS = [
+    'chr1\t100\t.\tA\tT,<DEL>,G\t.\tPASS\tDP=10;GENE=OLD',
+    'chr1\t200\t.\tA\t.\t.\tPASS\tDP=5;GENE=OLD',
+    'chr1\t300\t.\tA\tC\t.\tPASS\tGENE=OLD',
+    ]
+
+
+class TestVariantLookupData(unittest.TestCase):
+
+    def test_rebuilt_from_row(self):
+        variants = []
+        for row in ROWS:
+            simpleVCFClient.variant_lookup_data_from_vcf_record(
+                VCFRecord(row + '\n'), variants)
+        self.assertEqual(
+            [v.variant_string for v in variants],
+            ['chr1:100:A:T', 'chr1:100:A:<DEL>', 'chr1:100:A:G',
+             'chr1:200:A:', 'chr1:300:A:C']
+            )
+        self.assertEqual([v.alt_value for v in variants][3], None)
+        # rows of a chromosome share its entry of the chromosome table
+        self.assertEqual(len(set(v.chrom_index for v in variants)), 1)
+        self.assertEqual(
+            simpleVCFClient._chromosomes[variants[0].chrom_index], 'chr1')
+        # all ALT values of a row share its line
+        self.assertIs(variants[0].line, variants[2].line)
+        self.assertEqual(
+            [v.vcf_record.line for v in variants],
+            [ROWS[0]] * 3 + ROWS[1:])
+        self.assertEqual(variants[3].vcf_record.ALT, [])
+
+        other = simpleVCFClient.Variant_lookup_data(
+            ROWS[0], simpleVCFClient.chromosome_index('chrX'), 5, 'C', 'G')
+        self.assertEqual(other.variant_string, 'chrX:5:C:G')
+        self.assertEqual(
+            simpleVCFClient.chromosome_index('chr1'), variants[0].chrom_index)
+
+
+class TestSimpleVCFClient(unittest.TestCase):
+    """runs simpleVCFClient.py against the local mock api"""
+
+    def setUp(self):
+        self.server = MockVarsomeServer().start()
+        self.tmpdir = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmpdir, 'in.vcf')
+        with open(self.input, 'w') as f:
+            f.write(HEADER + ''.join(row + '\n' for row in ROWS))
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def annotate(self, *args):
+        """the data rows written by simpleVCFClient.py, split in
+        columns"""
+        output = os.path.join(self.tmpdir, 'out.vcf')
+        env = dict(os.environ, VARSOME_API_URL=self.server.url)
+        self.stderr = subprocess.run(
+            [sys.executable, 'simpleVCFClient.py', '-i', self.input,
+             '-o', output, '-k', 'key'] + list(args),
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True
+            ).stderr
+        with open(output) as f:
+            return [line.rstrip('\n').split('\t')
+                    for line in f if not line.startswith('#')]
+
+    def test_gene_per_allele(self):
+        rows = self.annotate()
+        self.assertEqual(
+            [(row[4], row[7]) for row in rows],
+            [('T,<DEL>,G', 'DP=10;GENE=GENE100,.,GENE100'),
+             ('.', 'DP=5'),
+             ('C', 'GENE=GENE300')]
+            )
+        # the symbolic allele is rejected locally, the row with ALT '.'
+        # is not looked up
+        self.assertEqual(self.server.variants, 3)
+
+    def test_split_alleles(self):
+        rows = self.annotate('-s')
+        self.assertEqual(
+            [(row[4], row[7]) for row in rows],
+            [('T', 'DP=10;GENE=GENE100'),
+             ('<DEL>', 'DP=10'),
+             ('G', 'DP=10;GENE=GENE100'),
+             ('.', 'DP=5'),
+             ('C', 'GENE=GENE300')]
+            )
+
+    def test_processes(self):
+        rows = self.annotate('-P', '2')
+        self.assertEqual([row[1] for row in rows], ['100', '200', '300'])
+        self.assertNotIn('Warning', self.stderr)
+
+        # a gzip compressed file can not be split
+        with open(self.input, 'rb') as f:
+            data = f.read()
+        self.input += '.gz'
+        with gzip.open(self.input, 'wb') as f:
+            f.write(data)
+        rows = self.annotate('-P', '2')
+        self.assertEqual(
+            [row[7] for row in rows],
+            ['DP=10;GENE=GENE100,.,GENE100', 'DP=5', 'GENE=GENE300'])
+        self.assertIn('can not be split into shards', self.stderr)
+
+    def test_single_lookups(self):
+        rows = self.annotate('-nb', '-w', '2')
+        self.assertEqual(
+            [row[7] for row in rows],
+            ['DP=10;GENE=GENE100,.,GENE100', 'DP=5', 'GENE=GENE300'])
+
+
+if __name__ == '__main__':
+    unittest.main()
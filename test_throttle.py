@@ -0,0 +1,54 @@
+import email.utils
+import time
+import unittest
+from variantapi.throttle import AdaptiveRateLimiter
+from variantapi.throttle import RetryPolicy
+from variantapi.throttle import parse_retry_after
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_should_retry(self):
+        policy = RetryPolicy(max_retries=2)
+        self.assertTrue(policy.should_retry(0, 503))
+        self.assertTrue(policy.should_retry(1))
+        self.assertFalse(policy.should_retry(2, 503))
+        self.assertFalse(policy.should_retry(0, 400))
+        self.assertFalse(policy.should_retry(0, 200))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(6):
+            delay = policy.delay(attempt)
+            self.assertLessEqual(delay, min(5, 2 ** attempt))
+            self.assertGreaterEqual(delay, min(5, 2 ** attempt) / 2)
+        self.assertEqual(policy.delay(0, '3'), 3)
+        self.assertEqual(policy.delay(0, '120'), 5)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('7'), 7)
+        self.assertIsNone(parse_retry_after('soon'))
+        date = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(date), 30, delta=2)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def test_rate_adapts(self):
+        limiter = AdaptiveRateLimiter(10, increase=1)
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(20):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+
+    def test_acquire_waits(self):
+        limiter = AdaptiveRateLimiter(100, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import gzip
+import unittest
+import zlib
+from variantapi.transfer import TransferStats, encode_body
+
+
+class TestTransfer(unittest.TestCase):
+
+    def test_encode_body(self):
+        body = b'{"variants": ["chr19:20082943:1:G"]}' * 100
+        self.assertEqual(gzip.decompress(encode_body(body, 'gzip')), body)
+        self.assertEqual(zlib.decompress(encode_body(body, 'deflate')), body)
+        self.assertRaises(ValueError, encode_body, body, 'br')
+
+    def test_stats(self):
+        stats = TransferStats()
+        self.assertEqual(stats.response_ratio, 1.0)
+        stats.record(100, 400, 50, 1000)
+        stats.record(0, 0, 150, 1000)
+        self.assertEqual(stats.requests, 2)
+        self.assertEqual(stats.compressed_requests, 1)
+        self.assertEqual(stats.request_ratio, 0.25)
+        self.assertEqual(stats.response_ratio, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from variantapi.tuning import BatchSizeTuner
+
+
+def run(tuner, batches, base=0.5, per_variant=0.001, bytes_per_variant=100):
+    """feed the tuner batches of a server answering in base + n *
+    per_variant seconds"""
+    for _ in range(batches):
+        n = tuner.size
+        tuner.record(n, base + n * per_variant, n * bytes_per_variant)
+
+
+class TestBatchSizeTuner(unittest.TestCase):
+
+    def test_grows_towards_target_latency(self):
+        tuner = BatchSizeTuner(2.0, initial_size=10)
+        run(tuner, 1)
+        # at most twofold growth per batch
+        self.assertEqual(tuner.size, 20)
+        run(tuner, 30)
+        # (2.0 - 0.5) / 0.001 variants, the request overhead is fitted
+        self.assertAlmostEqual(tuner.size, 1500, delta=15)
+        base, per_variant = tuner.latency_model()
+        self.assertAlmostEqual(base, 0.5, places=2)
+        self.assertAlmostEqual(per_variant, 0.001, places=5)
+
+    def test_single_size_has_no_base_latency(self):
+        tuner = BatchSizeTuner(2.0, initial_size=10)
+        self.assertIsNone(tuner.latency_model())
+        tuner.record(10, 1.0, 0)
+        self.assertEqual(tuner.latency_model(), (0.0, 0.1))
+
+    def test_clamped_to_min_and_max(self):
+        tuner = BatchSizeTuner(100.0, initial_size=5000, max_size=8000)
+        run(tuner, 5)
+        self.assertEqual(tuner.size, 8000)
+
+        tuner = BatchSizeTuner(0.1, initial_size=100, min_size=50)
+        run(tuner, 5)
+        self.assertEqual(tuner.size, 50)
+        self.assertEqual(BatchSizeTuner(1, initial_size=0, min_size=3).size, 3)
+
+    def test_response_bytes_cap(self):
+        tuner = BatchSizeTuner(
+            100.0, initial_size=100, max_response_bytes=50000)
+        run(tuner, 10, bytes_per_variant=100)
+        self.assertEqual(tuner.size, 500)
+
+    def test_errors_halve_size(self):
+        tuner = BatchSizeTuner(2.0, initial_size=1000, min_size=300)
+        tuner.record_error()
+        self.assertEqual(tuner.size, 500)
+        tuner.record_error()
+        self.assertEqual(tuner.size, 300)
+        self.assertEqual((tuner.batches, tuner.errors), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from variantapi.vcfio import VCFReader
+from variantapi.vcfio import iter_shard
+from variantapi.vcfio import plan_shards
+from variantapi.vcfio import VCFRecord
+from variantapi.vcfio import VCFWriter
+from variantapi.vcfio import remove_info_value
+from variantapi.vcfio import set_info_value
+
+
+class TestVCFRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.record = VCFRecord(
+            'chr6\t44387517\trs6923521\tC\tG,T\t184.84\tPASS\tAC=2;DB'
+            '\tGT:AD\t1/1:0,6\n'
+            )
+
+    def test_fields(self):
+        self.assertEqual(self.record.CHROM, 'chr6')
+        self.assertEqual(self.record.POS, 44387517)
+        self.assertEqual(self.record.REF, 'C')
+        self.assertEqual(self.record.ALT, ['G', 'T'])
+        self.assertEqual(self.record.INFO, 'AC=2;DB')
+        self.assertEqual(VCFRecord('1\t5\t.\tA\t.\t.\t.\t.').ALT, [])
+
+    def test_format(self):
+        self.assertEqual(
+            self.record.format(alt=['T'], info='AC=2;DB;GENE=X'),
+            'chr6\t44387517\trs6923521\tC\tT\t184.84\tPASS\tAC=2;DB;GENE=X'
+            '\tGT:AD\t1/1:0,6'
+            )
+        self.assertEqual(self.record.format(), self.record.line)
+
+    def test_set_info_value(self):
+        self.assertEqual(set_info_value('.', 'GENE', 'A'), 'GENE=A')
+        self.assertEqual(set_info_value('DB', 'GENE', 'A'), 'DB;GENE=A')
+        self.assertEqual(
+            set_info_value('GENE=A;DB', 'GENE', 'B'), 'GENE=B;DB'
+            )
+
+    def test_remove_info_value(self):
+        self.assertEqual(remove_info_value('DB;GENE=A', 'GENE'), 'DB')
+        self.assertEqual(remove_info_value('GENE=A', 'GENE'), '.')
+        self.assertEqual(remove_info_value('.', 'GENE'), '.')
+        self.assertEqual(
+            remove_info_value('GENES=A;DB', 'GENE'), 'GENES=A;DB')
+
+
+class TestVCFReaderWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sample = os.path.join(os.path.dirname(__file__), 'sample.vcf')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip_is_unchanged(self):
+        output = os.path.join(self.tmpdir, 'out.vcf')
+        with VCFReader(self.sample) as reader:
+            self.assertEqual(reader.header.samples, ['SRR309291'])
+            with VCFWriter(output, reader.header) as writer:
+                for record in reader:
+                    writer.write_record(record)
+        with open(self.sample) as a, open(output) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_gzip_input(self):
+        compressed = os.path.join(self.tmpdir, 'sample.vcf.gz')
+        with open(self.sample, 'rb') as a, gzip.open(compressed, 'wb') as b:
+            b.write(a.read())
+        with VCFReader(compressed) as reader:
+            self.assertEqual(
+                [r.CHROM for r in reader][:2],
+                ['chr6', 'chr6']
+                )
+
+    def test_add_info(self):
+        with VCFReader(self.sample) as reader:
+            reader.header.add_info('GENE', '.', 'String', 'genes')
+            reader.header.add_info('GENE', 'A', 'String', 'genes')
+            lines = reader.header.lines()
+        gene = [l for l in lines if l.startswith('##INFO=<ID=GENE,')]
+        self.assertEqual(
+            gene, ['##INFO=<ID=GENE,Number=A,Type=String,Description="genes">']
+            )
+        self.assertTrue(lines[lines.index(gene[0]) - 1].startswith('##INFO'))
+
+
+def write_indexed_bgzip(path, header, chromosomes):
+    """write a VCF as gzip members, one per chromosome, and a minimal
+    tabix index with one chunk per chromosome"""
+    starts = []
+    with open(path, 'wb') as f:
+        f.write(gzip.compress(header.encode('utf8')))
+        for name, lines in chromosomes:
+            starts.append(f.tell() << 16)
+            f.write(gzip.compress(''.join(lines).encode('utf8')))
+        end = f.tell() << 16
+
+    names = b''.join(name.encode('utf8') + b'\x00' for name, _ in chromosomes)
+    index = b'TBI\x01' + struct.pack(
+        '<iiiiiiii', len(chromosomes), 2, 1, 2, 0, ord('#'), 0, len(names))
+    index += names
+    bounds = starts[1:] + [end]
+    for start, stop in zip(starts, bounds):
+        # one regular bin with one chunk, the pseudo bin, no linear index
+        index += struct.pack('<iIiQQ', 2, 4681, 1, start, stop)
+        index += struct.pack('<IiQQQQ', 37450, 2, start, stop, 1, 0)
+        index += struct.pack('<i', 0)
+    with gzip.open(path + '.tbi', 'wb') as f:
+        f.write(index)
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sample = os.path.join(os.path.dirname(__file__), 'sample.vcf')
+        with VCFReader(self.sample) as reader:
+            self.lines = [r.line for r in reader]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_shards(self, path, count):
+        lines = []
+        for shard in plan_shards(path, count):
+            lines.extend(r.line for r in iter_shard(path, shard))
+        return lines
+
+    def test_byte_ranges(self):
+        for count in (1, 3, 16, 5000):
+            self.assertEqual(self.read_shards(self.sample, count), self.lines)
+
+    def test_indexed_bgzip(self):
+        path = os.path.join(self.tmpdir, 'sample.vcf.gz')
+        chromosomes = [
+            ('chr{}'.format(n), [
+                line.replace('chr6', 'chr{}'.format(n), 1) + '\n'
+                for line in self.lines[i:i+100]
+                ])
+            for n, i in ((1, 0), (2, 100), (10, 200))
+            ]
+        write_indexed_bgzip(path, '##fileformat=VCFv4.1\n#CHROM\n', chromosomes)
+
+        shards = plan_shards(path, 8)
+        self.assertEqual([s[1] for s in shards], ['chr1', 'chr2', 'chr10'])
+        self.assertEqual(
+            self.read_shards(path, 8),
+            [line.rstrip('\n') for _, lines in chromosomes for line in lines]
+            )
+
+    def test_unindexed_gzip(self):
+        path = os.path.join(self.tmpdir, 'sample.vcf.gz')
+        with open(self.sample, 'rb') as a, gzip.open(path, 'wb') as b:
+            b.write(a.read())
+        self.assertEqual(plan_shards(path, 8), [('all',)])
+        self.assertEqual(self.read_shards(path, 8), self.lines)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+
+import aiohttp
+
+from variantapi.client import VariantAPIClient, VarsomeHTTPError
+
+
+class AsyncVariantAPIClient(object):
+    """asyncio counterpart of VariantAPIClient.
+
+    All requests share one aiohttp session with a keep-alive connection
+    pool. A semaphore bounds the number of requests in flight, so any
+    number of lookup coroutines can be gathered on the same event loop.
+
+    use as an async context manager, or call close() when done::
+
+        async with AsyncVariantAPIClient(api_key) as api:
+            results = await asyncio.gather(*[api.lookup(q) for q in queries])
+    """
+    schema_lookup_path = VariantAPIClient.schema_lookup_path
+    lookup_path = VariantAPIClient.lookup_path
+    batch_lookup_path = VariantAPIClient.batch_lookup_path
+
+    def __init__(self, api_key=None, batch_size=10000, max_concurrency=10,
+                 api_url=None):
+        """
+
+        :param api_key: api token, required for batch lookups
+        :param batch_size: number of variants posted per batch request
+        :param max_concurrency: maximum number of requests in flight.
+            Also the size of the connection pool.
+        :param api_url: base url of the api, defaults to the
+            VARSOME_API_URL environment variable or https://api.varsome.com
+        """
+        self._api_url = VariantAPIClient._resolve_api_url(api_url)
+        self._headers = {'Accept': 'application/json'}
+
+        if api_key is not None:
+            self._headers['Authorization'] = 'Token ' + api_key
+
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # created lazily so the client can be constructed outside of a
+        # running event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=self._headers,
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_concurrency,
+                    keepalive_timeout=30
+                    ),
+                )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _make_request(self, path, method='GET', params=None,
+                            json_data=None):
+        session = self._get_session()
+        if params is not None:
+            # aiohttp only accepts str, int and float query values
+            params = {k: str(v) for k, v in params.items()}
+        async with self._semaphore:
+            async with session.request(
+                    method,
+                    self._api_url + path,
+                    params=params,
+                    json=json_data
+                    ) as r:
+                if r.status in VarsomeHTTPError.ERROR_CODES:
+                    raise VarsomeHTTPError(r.status)
+                return await r.json(content_type=None)
+
+    async def get(self, path, params=None):
+        return await self._make_request(path, 'GET', params=params)
+
+    async def post(self, path, params=None, json_data=None):
+        return await self._make_request(
+            path,
+            'POST',
+            params=params,
+            json_data=json_data
+            )
+
+    async def schema(self):
+        return await self.get(self.schema_lookup_path)
+
+    async def lookup(self, query, params=None, ref_genome='hg19'):
+        """
+
+        :param query: variant representation
+        :param params: dictionary of key value pairs for
+            http GET parameters. Refer to the api documentation
+        of https://api.varsome.com for examples
+        :param ref_genome: reference genome (hg19 or hg38)
+        :return:dictionary of annotations. refer to
+            https://api.varsome.com/lookup/schema for dictionary properties
+        """
+        return await self.get(
+            self.lookup_path.format(query, ref_genome),
+            params=params
+            )
+
+    async def batch_lookup(self, variants, params=None, ref_genome='hg19'):
+        """return list of query results for all variants.
+
+        split variants into chunks of size batch_size and post them
+        concurrently (bounded by max_concurrency).
+
+        :param variants: list of variant representations
+        :param params: dictionary of key value pairs for http GET parameters.
+            Refer to the api documentation of
+            https://api.varsome.com for examples
+        :param ref_genome: reference genome (hg19 or hg38)
+        :return: list of dictionaries with annotations per variant
+            refer to https://api.varsome.com/lookup/schema
+            for dictionary properties
+        """
+        n = self.batch_size
+        chunks = [variants[i:i+n] for i in range(0, len(variants), n)]
+
+        responses = await asyncio.gather(*[
+            self.post(
+                self.batch_lookup_path.format(ref_genome),
+                params=params,
+                json_data={'variants': chunk}
+                )
+            for chunk in chunks
+            ])
+
+        results = []
+        for data in responses:
+            results.extend(data)
+        return results
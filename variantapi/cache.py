@@ -0,0 +1,196 @@
+import collections
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+
+def normalise_query(query):
+    """return the form of a variant query used to compare queries."""
+    return query.strip()
+
+
+class SQLiteCache(object):
+    """persistent annotation cache backed by a local SQLite database.
+
+    entries are keyed by (normalised query, reference genome, request
+    params), so the same variant looked up with different params or
+    against another genome is cached separately.
+
+    :param path: database file, created if it does not exist
+    :param ttl: seconds after which an entry is considered stale and
+        looked up again. None keeps entries forever.
+    :param max_entries: maximum number of entries to keep. The least
+        recently used entries are evicted once the limit is exceeded.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # imported here, clients without a cache never need sqlite3
+        import sqlite3
+        self._lock = threading.Lock()
+        # lookups may run on worker threads, all access goes through _lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS annotations ('
+            'key TEXT PRIMARY KEY, '
+            'value TEXT NOT NULL, '
+            'created REAL NOT NULL, '
+            'accessed REAL NOT NULL)'
+            )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS annotations_accessed '
+            'ON annotations (accessed)'
+            )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(query, ref_genome, params=None):
+        params = sorted(
+            (str(k), str(v)) for k, v in (params or {}).items()
+            )
+        return json.dumps([normalise_query(query), str(ref_genome), params])
+
+    def get(self, key):
+        """return the cached value for key, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """return a dictionary with the cached values of all keys found."""
+        keys = list(set(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            # stay below SQLite's limit of host parameters per statement
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                rows = self._db.execute(
+                    'SELECT key, value, created FROM annotations '
+                    'WHERE key IN ({})'.format(','.join('?' * len(part))),
+                    part
+                    )
+                for key, value, created in rows:
+                    if self.ttl is None or now - created <= self.ttl:
+                        found[key] = json.loads(value)
+            if found:
+                self._db.executemany(
+                    'UPDATE annotations SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in found]
+                    )
+                self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """store (key, value) pairs, then evict entries over max_entries."""
+        now = time.time()
+        rows = [(key, json.dumps(value), now, now) for key, value in items]
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO annotations '
+                '(key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                rows
+                )
+            if self.ttl is not None:
+                self._db.execute(
+                    'DELETE FROM annotations WHERE created < ?',
+                    (now - self.ttl,)
+                    )
+            if self.max_entries is not None:
+                self._db.execute(
+                    'DELETE FROM annotations WHERE key IN ('
+                    'SELECT key FROM annotations '
+                    'ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                    )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM annotations'
+                ).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM annotations')
+            self._db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LRUCache(object):
+    """thread safe in-memory least recently used cache.
+
+    get_or_compute coalesces concurrent calls for the same key: while
+    the value for a key is being computed, other callers asking for it
+    wait for that computation instead of starting their own.
+
+    cached values are shared between callers and must not be modified.
+
+    :param max_size: maximum number of values to keep
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+        self._pending = {}
+
+    def get_or_compute(self, key, compute):
+        """return the value for key, calling compute() on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,153 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class CheckpointedBatchJob(object):
+    """batch lookup that can be resumed after a crash.
+
+    variants are split into chunks of a fixed size and the results of
+    every completed chunk are appended to a journal file. Running the
+    same job again with the same journal skips the chunks found in it,
+    so an interrupted job only repeats the chunks that were in flight.
+
+    the journal is a json lines file: a header describing the job,
+    followed by one line per completed chunk.
+
+    :param client: VariantAPIClient used for the lookups. Its
+        max_workers, cache and retry settings apply.
+    :param journal_path: journal file, created if it does not exist
+    :param params: dictionary of request parameters
+    :param ref_genome: reference genome (hg19 or hg38)
+    :param chunk_size: variants per chunk, defaults to client.batch_size.
+        Must stay the same between runs of a job.
+    :param isolate_errors: record error results for the variants failing
+        their chunk instead of raising, see VariantAPIClient.batch_lookup
+    """
+
+    def __init__(self, client, journal_path, params=None, ref_genome='hg19',
+                 chunk_size=None, isolate_errors=False):
+        self.client = client
+        self.journal_path = journal_path
+        self.params = params
+        self.ref_genome = ref_genome
+        self.chunk_size = chunk_size or client.batch_size
+        self.isolate_errors = isolate_errors
+        self.skipped_chunks = 0
+        self.completed_chunks = 0
+
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._journal = None
+
+    def _header(self):
+        return {
+            'params': sorted(
+                [str(k), str(v)] for k, v in (self.params or {}).items()
+                ),
+            'ref_genome': str(self.ref_genome),
+            'chunk_size': self.chunk_size,
+            }
+
+    @staticmethod
+    def _digest(chunk):
+        return hashlib.sha1('\n'.join(chunk).encode('utf8')).hexdigest()
+
+    def _open_journal(self):
+        """read completed chunks from the journal and open it for appending."""
+        header = self._header()
+        self._offsets = {}
+        end = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line.decode('utf8'))
+                    except ValueError:
+                        # the last line may be cut short by a crash
+                        break
+                    if end == 0:
+                        if entry != header:
+                            raise CheckpointError(
+                                'journal {} belongs to a job with different '
+                                'parameters'.format(self.journal_path)
+                                )
+                    else:
+                        self._offsets[entry['chunk']] = (end, entry['digest'])
+                    end += len(line)
+
+        self._journal = open(self.journal_path, 'ab')
+        self._journal.truncate(end)
+        if end == 0:
+            self._append(header)
+
+    def _append(self, entry):
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf8')
+        with self._lock:
+            self._journal.write(line)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def _read_chunk(self, offset):
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline().decode('utf8'))['results']
+
+    def _run_chunk(self, item):
+        index, chunk = item
+        digest = self._digest(chunk)
+        done = self._offsets.get(index)
+        if done is not None and done[1] == digest:
+            with self._lock:
+                self.skipped_chunks += 1
+            return self._read_chunk(done[0])
+
+        if self.isolate_errors:
+            lookup = self.client._lookup_chunk_isolated
+        else:
+            lookup = self.client._lookup_chunk
+        results = lookup(chunk, self.params, self.ref_genome)
+        self.client.metrics.record_variants(len(results))
+        self._append({'chunk': index, 'digest': digest, 'results': results})
+        with self._lock:
+            self.completed_chunks += 1
+        return results
+
+    def _iter_chunks(self, variants):
+        variants = iter(variants)
+        for index in itertools.count():
+            chunk = [
+                v.rstrip('\r\n')
+                for v in itertools.islice(variants, self.chunk_size)
+                ]
+            if not chunk:
+                return
+            yield index, chunk
+
+    def iter_results(self, variants):
+        """yield the results of all variants, in input order.
+
+        :param variants: iterable of variant representations. Must yield
+            the same variants in the same order on every run of the job;
+            chunks whose variants changed are looked up again.
+        """
+        self._open_journal()
+        try:
+            for data in self.client._map_ordered(
+                    self._run_chunk,
+                    self._iter_chunks(variants)
+                    ):
+                for result in data:
+                    yield result
+        finally:
+            self._journal.close()
+
+    def run(self, variants):
+        """return the list of results of all variants, in input order."""
+        return list(self.iter_results(variants))
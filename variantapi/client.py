@@ -1,12 +1,39 @@
+import collections
+import itertools
+import json
 import logging
-import requests
+import os
+import time
+
+from variantapi.cache import LRUCache, normalise_query
+from variantapi.metrics import ClientMetrics
+from variantapi.normalise import (
+    InvalidVariantError, error_record, is_error_record, normalise_variant)
+from variantapi.throttle import AdaptiveRateLimiter, RetryPolicy
+from variantapi.transfer import CONTENT_ENCODINGS, encode_body
+from variantapi.tuning import BatchSizeTuner
 
 __author__ = 'saphetor, Leopold von Seckendorff'
 
 _debug = False
-logging.basicConfig(
-    level=logging.DEBUG if _debug else logging.INFO
-    )
+
+# the client logs retries and failed variants, applications decide where
+# (and if) they go, e.g. with logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_json_loads = None
+
+
+def _decode_json(content):
+    global _json_loads
+    if _json_loads is None:
+        try:
+            # optional, decodes large responses several times faster
+            from orjson import loads as _json_loads
+        except ImportError:
+            from json import loads as _json_loads
+    return _json_loads(content)
+
 
 class VarsomeHTTPError(Exception):
     ERROR_CODES = {
@@ -20,6 +47,7 @@ class VarsomeHTTPError(Exception):
              "exceeded the rate limit (see below).",
         404: "Not Found: either you're requesting an invalid URI "
              "or the resource in question doesn't exist",
+        429: "Too Many Requests: you have exceeded the rate limit.",
         500: "Internal Server Error: we did something wrong.",
         501: "Not implemented.",
         502: "Bad Gateway: returned if VariantAPI is down or being upgraded.",
@@ -30,6 +58,12 @@ class VarsomeHTTPError(Exception):
 
     def __init__(self, status):
         super().__init__('{} ({})'.format(status, self.ERROR_CODES[status]))
+        self.status = status
+
+    def __reduce__(self):
+        # unpickling (e.g. errors raised in worker processes) must pass
+        # the status again, not the message
+        return (self.__class__, (self.status,))
 
 class VariantAPIClientBase(object):
     if _debug:
@@ -37,48 +71,240 @@ class VariantAPIClientBase(object):
     else:
         _api_url = 'https://api.varsome.com'
 
-    def __init__(self, api_key=None):
-        self._headers = {'Accept': 'application/json'}
+    # request bodies smaller than this are not worth compressing
+    _min_compress_size = 1024
+
+    def __init__(self, api_key=None, pool_size=None,
+                 response_cache_size=None, max_retries=0, rate_limit=None,
+                 compress_requests=None, compress_responses=True,
+                 metrics=None, api_url=None):
+        """
+
+        :param api_key: api token
+        :param pool_size: number of keep-alive connections to keep open,
+            set it to the number of threads sharing the client
+        :param response_cache_size: number of get/post results to keep
+            in an in-memory LRU cache. Identical requests issued while one
+            is in flight share its response. None disables the cache.
+        :param max_retries: number of times a request failing with a
+            rate limit (403, 429), overload (502-504) or connection
+            error is retried, with jittered exponential backoff.
+        :param rate_limit: maximum number of requests per second. The
+            rate is lowered while the server throttles and recovers
+            afterwards. None sends requests as fast as they are issued.
+        :param compress_requests: Content-Encoding of POST bodies, gzip
+            (or True) or deflate. None sends them uncompressed. If the
+            server rejects compressed bodies (415) they are sent
+            uncompressed from then on.
+        :param compress_responses: ask for gzip or deflate compressed
+            responses. Bytes sent and received, compressed and not, are
+            counted in transfer_stats.
+        :param metrics: variantapi.metrics.ClientMetrics recording
+            latencies, bytes, retries and cache hits. Several clients can
+            share one. Defaults to a new ClientMetrics.
+        :param api_url: base url of the api, e.g. of a local mock server.
+            Defaults to the VARSOME_API_URL environment variable, if set,
+            or https://api.varsome.com
+        """
+        self._api_url = self._resolve_api_url(api_url)
+        if compress_requests is True:
+            compress_requests = 'gzip'
+        if compress_requests and compress_requests not in CONTENT_ENCODINGS:
+            raise ValueError(
+                'compress_requests must be one of {}'.format(CONTENT_ENCODINGS)
+                )
+        self.compress_requests = compress_requests or None
+        self.metrics = metrics if metrics is not None else ClientMetrics()
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.rate_limiter = None
+        if rate_limit:
+            self.rate_limiter = AdaptiveRateLimiter(rate_limit)
+
+        self.response_cache = None
+        if response_cache_size:
+            self.response_cache = LRUCache(response_cache_size)
+            self.metrics.add_cache('response', self.response_cache)
+
+        self._headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding':
+                ', '.join(CONTENT_ENCODINGS) if compress_responses
+                else 'identity',
+            }
 
         if api_key is not None:
             self._headers['Authorization'] = 'Token ' + api_key
 
+        # requests and urllib3 take longer to import than everything
+        # else here, so they are only imported once a client is created
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._connection_errors = (requests.ConnectionError, requests.Timeout)
         self.session = requests.Session()
         self.session.headers.update(self._headers)
+        if pool_size is not None:
+            # one keep-alive connection per worker thread, so concurrent
+            # requests never wait on (or discard) pooled connections
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size
+                )
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+
+    @classmethod
+    def _resolve_api_url(cls, api_url=None):
+        url = api_url or os.environ.get('VARSOME_API_URL') or cls._api_url
+        return url.rstrip('/')
+
+    @property
+    def transfer_stats(self):
+        """bytes sent and received, see variantapi.transfer.TransferStats"""
+        return self.metrics.transfer
 
     def _make_request(self, path, method='GET', params=None, json_data=None):
+        start = time.time()
+        self.metrics.call_started()
+        try:
+            return self._make_request_retrying(path, method, params, json_data)
+        finally:
+            self.metrics.record_call(method, time.time() - start)
+
+    def _make_request_retrying(self, path, method, params, json_data):
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                r = self._send(path, method, params, json_data)
+            except self._connection_errors as e:
+                self.metrics.record_error(method, e)
+                if not self.retry_policy.should_retry(attempt):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.info('{} {} failed ({}), retrying in {:.1f}s'.format(
+                    method, path, e, delay))
+            else:
+                self._observe_status(r.status_code)
+                if not self.retry_policy.should_retry(attempt, r.status_code):
+                    break
+                delay = self.retry_policy.delay(
+                    attempt,
+                    r.headers.get('Retry-After')
+                    )
+                logger.info('{} {} returned {}, retrying in {:.1f}s'.format(
+                    method, path, r.status_code, delay))
+
+            self.metrics.record_retry(method)
+            time.sleep(delay)
+            attempt += 1
+
+        if r.status_code in VarsomeHTTPError.ERROR_CODES:
+            raise VarsomeHTTPError(r.status_code)
+
+        return r
+
+    def _send(self, path, method, params, json_data):
+        payload = body = None
         if method == 'GET':
-            r = self.session.get(self._api_url + path, params=params)
+            r = self.session.get(
+                self._api_url + path,
+                params=params,
+                stream=True
+                )
         elif method == 'POST':
+            headers = {}
+            if json_data is not None:
+                payload = body = json.dumps(json_data).encode('utf8')
+                headers['Content-Type'] = 'application/json'
+                encoding = self.compress_requests
+                if encoding and len(payload) >= self._min_compress_size:
+                    body = encode_body(payload, encoding)
+                    headers['Content-Encoding'] = encoding
             r = self.session.post(
                 self._api_url + path,
                 params=params,
-                json=json_data,
-                headers={'Content-Type': 'application/json'}
-                    if json_data is not None else None
+                data=body,
+                headers=headers,
+                stream=True
                 )
-            logging.debug(
-                'Time between request and response {}'.format(r.elapsed)
+            if r.status_code == 415 and 'Content-Encoding' in headers:
+                logger.info(
+                    'compressed requests are not accepted, sending them '
+                    'uncompressed'
+                    )
+                r.close()
+                self.compress_requests = None
+                return self._send(path, method, params, json_data)
+
+        # the body is decompressed chunk by chunk while it is read
+        download_start = time.time()
+        content = r.content
+        download = time.time() - download_start
+        self.metrics.record_response(
+            method,
+            path,
+            r.status_code,
+            r.elapsed.total_seconds(),
+            download,
+            len(body or b''),
+            len(payload or b''),
+            r.raw.tell(),
+            len(content)
+            )
+        logger.debug(
+            '{} {} returned {} after {}, body read in {:.3f}s, '
+            'content length {} ({} received)'.format(
+                method, path, r.status_code, r.elapsed, download,
+                len(content), r.raw.tell()))
+        return r
+
+    def _observe_status(self, status):
+        if self.rate_limiter is None:
+            return
+        if status in RetryPolicy.THROTTLE_STATUSES:
+            self.rate_limiter.on_throttle()
+        elif status < 400:
+            self.rate_limiter.on_success()
+
+    def _cached_request(self, path, method, params=None, json_data=None,
+                        on_response=None):
+        def request():
+            response = self._make_request(
+                path,
+                method,
+                params=params,
+                json_data=json_data
                 )
-            logging.debug('Content length {}'.format(len(r.content)))
+            if on_response is not None:
+                on_response(response)
+            decode_start = time.time()
+            data = _decode_json(response.content)
+            self.metrics.record_decode(method, time.time() - decode_start)
+            return data
 
-        if r.status_code in VarsomeHTTPError.ERROR_CODES:
-            raise VarsomeHTTPError(r.status_code)
+        if self.response_cache is None:
+            return request()
 
-        return r
+        key = (
+            method,
+            path,
+            tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+            json.dumps(json_data, sort_keys=True)
+            )
+        return self.response_cache.get_or_compute(key, request)
 
     def get(self, path, params=None):
-        response = self._make_request(path, 'GET', params=params)
-        return response.json()
+        return self._cached_request(path, 'GET', params=params)
 
     def post(self, path, params=None, json_data=None):
-        response = self._make_request(
-                        path,
-                        'POST',
-                        params=params,
-                        json_data=json_data
-                        )
-        return response.json()
+        return self._cached_request(
+            path,
+            'POST',
+            params=params,
+            json_data=json_data
+            )
 
 
 class VariantAPIClient(VariantAPIClientBase):
@@ -86,14 +312,81 @@ class VariantAPIClient(VariantAPIClientBase):
     lookup_path = '/lookup/{}/{}'
     batch_lookup_path = '/lookup/batch/{}'
 
-    def __init__(self, api_key=None, batch_size=10000):
-        super(VariantAPIClient, self).__init__(api_key)
+    # requests per second lookup_many sends on behalf of clients without
+    # an api key and without a rate_limit of their own. This is not a
+    # quota published by the api, which throttles keyless clients (403)
+    # at a rate it does not document; it is a conservative default of
+    # this client so that concurrent keyless lookups don't run straight
+    # into throttling. The rate adapts to 403s and successes like
+    # rate_limit does. Set it to None to send lookups unthrottled.
+    keyless_rate_limit = 10
+
+    # statuses of batch requests failing because of some of their
+    # variants, see batch_lookup's isolate_errors. A 404 means a wrong
+    # path (e.g. reference genome), which no variant can cause.
+    isolated_statuses = (400,)
+
+    # a failed chunk is first split into this many parts, which are then
+    # bisected. If no part of a chunk succeeds down to a single variant,
+    # the error is not caused by the variants (e.g. a bad parameter) and
+    # is raised after a few requests, instead of one per variant.
+    isolation_parts = 4
+
+    def __init__(self, api_key=None, batch_size=10000, max_workers=1,
+                 max_in_flight=None, cache=None, target_latency=None,
+                 lookup_workers=8, **kwargs):
+        """
+
+        :param api_key: api token, required for batch lookups
+        :param batch_size: number of variants posted per batch request
+        :param max_workers: number of chunks of a batch lookup that are
+            posted concurrently. 1 (the default) posts chunks one after
+            another.
+        :param max_in_flight: maximum number of chunks submitted but not
+            yet consumed. Defaults to max_workers.
+        :param cache: optional annotation cache, e.g.
+            variantapi.cache.SQLiteCache. lookup and batch_lookup only
+            query the api for variants missing from it.
+        :param target_latency: if set, the number of variants per batch
+            request is tuned continuously (up to batch_size) so that a
+            request takes about target_latency seconds.
+        :param lookup_workers: number of single lookups lookup_many
+            runs concurrently
+        :param kwargs: pool_size, response_cache_size, max_retries,
+            rate_limit, compress_requests, compress_responses, metrics
+            and api_url are passed on to VariantAPIClientBase. pool_size
+            defaults to the larger of max_workers and lookup_workers.
+        """
+        kwargs.setdefault('pool_size', max(max_workers, lookup_workers))
+        super(VariantAPIClient, self).__init__(api_key, **kwargs)
+        self.has_api_key = api_key is not None
+        self._keyless_limiter = None
         self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight or max_workers
+        self.lookup_workers = lookup_workers
+        self.cache = cache
+        if cache is not None:
+            self.metrics.add_cache('annotations', cache)
+        self.batch_size_tuner = None
+        if target_latency:
+            self.batch_size_tuner = BatchSizeTuner(
+                target_latency,
+                initial_size=min(100, batch_size),
+                max_size=batch_size
+                )
+
+    @property
+    def current_batch_size(self):
+        """number of variants that will be posted in the next chunk."""
+        if self.batch_size_tuner is not None:
+            return self.batch_size_tuner.size
+        return self.batch_size
 
     def schema(self):
         return self.get(self.schema_lookup_path)
 
-    def lookup(self, query, params=None, ref_genome='hg19'):
+    def lookup(self, query, params=None, ref_genome='hg19', projection=None):
         """
 
         :param query: variant representation
@@ -101,15 +394,104 @@ class VariantAPIClient(VariantAPIClientBase):
             http GET parameters. Refer to the api documentation
         of https://api.varsome.com for examples
         :param ref_genome: reference genome (hg19 or hg38)
+        :param projection: optional variantapi.projection.Projection.
+            The params it needs are added to params, and only its paths
+            are kept from the results.
         :return:dictionary of annotations. refer to
             https://api.varsome.com/lookup/schema for dictionary properties
         """
-        return self.get(
-            self.lookup_path.format(query, ref_genome),
-            params=params
-            )
+        return self._lookup(query, params, ref_genome, projection)
+
+    def _lookup(self, query, params, ref_genome, projection, limiter=None):
+        """lookup, sending the request (on a cache miss only) at the pace
+        of limiter if given"""
+        if projection is not None:
+            params = projection.params(params)
+
+        result = None
+        if self.cache is not None:
+            key = self.cache.make_key(query, ref_genome, params)
+            result = self.cache.get(key)
+
+        if result is None:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                result = self.get(
+                    self.lookup_path.format(query, ref_genome),
+                    params=params
+                    )
+            except VarsomeHTTPError as e:
+                if (limiter is not None
+                        and e.status in RetryPolicy.THROTTLE_STATUSES):
+                    limiter.on_throttle()
+                raise
+            if limiter is not None:
+                limiter.on_success()
+            if self.cache is not None:
+                self.cache.set(key, result)
+
+        self.metrics.record_variants(1)
+        if projection is not None:
+            result = projection.extract(result)
+        return result
+
+    def lookup_many(self, queries, params=None, ref_genome='hg19',
+                    projection=None, validate=False):
+        """return list of lookup results for all queries, in input order.
 
-    def batch_lookup(self, variants, params=None, ref_genome='hg19'):
+        unlike batch_lookup this needs no api key: every query is a
+        single lookup, and lookup_workers of them run concurrently over
+        keep-alive connections. Without an api key (and rate_limit) the
+        lookups are sent at keyless_rate_limit requests per second.
+
+        :param queries: iterable of variant representations
+        :param params: dictionary of key value pairs for
+            http GET parameters
+        :param ref_genome: reference genome (hg19 or hg38)
+        :param projection: optional variantapi.projection.Projection
+        :param validate: validate and normalise queries locally first,
+            see batch_lookup
+        :return: list of dictionaries with annotations per query
+        """
+        return list(self.iter_lookup_many(
+            queries, params, ref_genome, projection, validate))
+
+    def iter_lookup_many(self, queries, params=None, ref_genome='hg19',
+                         projection=None, validate=False):
+        """like lookup_many, but yields the results as they complete."""
+        limiter = self._lookup_many_limiter()
+
+        def lookup_one(query):
+            return self._lookup(
+                query.strip(), params, ref_genome, projection, limiter)
+
+        def lookup_all(queries):
+            return self._map_ordered(
+                lookup_one,
+                queries,
+                workers=self.lookup_workers,
+                in_flight=2 * self.lookup_workers
+                )
+
+        if validate:
+            return self._iter_validated(queries, lookup_all)
+        return lookup_all(queries)
+
+    def _lookup_many_limiter(self):
+        """the limiter of lookup_many's requests besides rate_limiter,
+        shared by all lookup_many calls of a keyless client"""
+        if (self.has_api_key or self.rate_limiter is not None
+                or not self.keyless_rate_limit):
+            return None
+        if self._keyless_limiter is None:
+            self._keyless_limiter = AdaptiveRateLimiter(
+                self.keyless_rate_limit)
+        return self._keyless_limiter
+
+    def batch_lookup(self, variants, params=None, ref_genome='hg19',
+                     deduplicate=False, projection=None, validate=False,
+                     isolate_errors=False):
         """return list of query results for all variants.
 
         split variants into chunks of size batch_size.
@@ -120,19 +502,322 @@ class VariantAPIClient(VariantAPIClientBase):
             Refer to the api documentation of
             https://api.varsome.com for examples
         :param ref_genome: reference genome (hg19 or hg38)
+        :param deduplicate: look up each distinct variant only once and
+            repeat its result at every position it occurs in variants.
+            Repeated positions share the same result object.
+        :param projection: optional variantapi.projection.Projection.
+            The params it needs are added to params, and only its paths
+            are kept from the results.
+        :param validate: validate and normalise variants locally (see
+            variantapi.normalise.normalise_variant) before sending them.
+            Invalid variants are not sent, their result is a dictionary
+            with the 'query' and the 'error'. Variants with several ALT
+            values are looked up per ALT value, their result is the list
+            of results.
+        :param isolate_errors: if a chunk fails with one of
+            isolated_statuses, split it in halves until the variants
+            causing the error are found instead of raising. Their
+            results are dictionaries with the 'query' and the 'error'.
+            The error is still raised if every part of the chunk fails,
+            see isolation_parts.
         :return: list of dictionaries with annotations per variant
             refer to https://api.varsome.com/lookup/schema
             for dictionary properties
         """
-        n = self.batch_size
-        chunks = [variants[i:i+n] for i in range(0, len(variants), n)]
-        
+        if validate:
+            return list(self._iter_validated(
+                variants,
+                lambda queries: self.batch_lookup(
+                    list(queries), params, ref_genome,
+                    deduplicate=deduplicate, projection=projection,
+                    isolate_errors=isolate_errors)
+                ))
+        if not deduplicate:
+            return list(self.iter_batch_lookup(
+                variants, params, ref_genome, projection,
+                isolate_errors=isolate_errors))
+
+        # a query may resolve to a list of variants (e.g. HGVS notations),
+        # results are mapped back per query, never per returned variant
+        unique = {}
+        positions = [
+            unique.setdefault(normalise_query(v), len(unique))
+            for v in variants
+            ]
+        results = list(self.iter_batch_lookup(
+            unique, params, ref_genome, projection,
+            isolate_errors=isolate_errors))
+        return [results[i] for i in positions]
+
+    def iter_batch_lookup(self, variants, params=None, ref_genome='hg19',
+                          projection=None, validate=False,
+                          isolate_errors=False):
+        """yield query results for all variants as their chunks complete.
+
+        streaming form of batch_lookup: variants are read from the
+        iterable one chunk at a time, so only batch_size * max_in_flight
+        variants and their results are held in memory at once. With
+        target_latency set, each chunk is sized by the batch size tuner.
+
+        :param variants: iterable of variant representations, e.g. a list,
+            a generator or an open file with one variant per line
+            (trailing newlines are stripped)
+        :param params: dictionary of key value pairs for http GET parameters.
+            Refer to the api documentation of
+            https://api.varsome.com for examples
+        :param ref_genome: reference genome (hg19 or hg38)
+        :param projection: optional variantapi.projection.Projection.
+            The params it needs are added to params, and only its paths
+            are kept from the results.
+        :param validate: validate and normalise variants locally first,
+            see batch_lookup
+        :param isolate_errors: return error records for the variants
+            failing their chunk instead of raising, see batch_lookup
+        :return: generator of dictionaries with annotations per variant,
+            in input order
+        """
+        if validate:
+            return self._iter_validated(
+                variants,
+                lambda queries: self.iter_batch_lookup(
+                    queries, params, ref_genome, projection,
+                    isolate_errors=isolate_errors)
+                )
+        return self._iter_batch_lookup(
+            variants, params, ref_genome, projection, isolate_errors)
+
+    def _iter_batch_lookup(self, variants, params, ref_genome, projection,
+                           isolate_errors):
+        if projection is not None:
+            params = projection.params(params)
+        if isolate_errors:
+            lookup = self._lookup_chunk_isolated
+        else:
+            lookup = self._lookup_chunk
+
+        def lookup_chunk(chunk):
+            data = lookup(chunk, params, ref_genome)
+            self.metrics.record_variants(len(data))
+            if projection is not None:
+                # drop unneeded annotations as soon as a chunk arrives,
+                # error records of isolated variants are kept whole
+                data = [
+                    result if is_error_record(result)
+                    else projection.extract(result)
+                    for result in data
+                    ]
+            return data
+
+        for data in self._map_ordered(
+                lookup_chunk,
+                self._iter_chunks(variants)
+                ):
+            for result in data:
+                yield result
+
+    def _iter_validated(self, variants, lookup):
+        """yield the results of lookup(queries) for the normalised
+        variants, and error records for the invalid ones, in input order.
+
+        queries are produced lazily while lookup consumes them, so
+        invalid variants neither hold back the valid ones nor wait for
+        the results of earlier variants.
+        """
+        # per variant in input order its error record, or the number of
+        # queries it was normalised to
+        plan = collections.deque()
+
+        def queries():
+            for variant in variants:
+                try:
+                    normalised = normalise_variant(variant)
+                except InvalidVariantError as e:
+                    plan.append(error_record(variant, e))
+                    continue
+                plan.append(len(normalised))
+                for query in normalised:
+                    yield query
+
+        results = iter(lookup(queries()))
+        while True:
+            while plan and isinstance(plan[0], dict):
+                yield plan.popleft()
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            # errors of variants read while the result was looked up
+            while isinstance(plan[0], dict):
+                yield plan.popleft()
+            count = plan.popleft()
+            if count == 1:
+                yield result
+            else:
+                yield [result] + [next(results) for _ in range(count - 1)]
+        while plan:
+            yield plan.popleft()
+
+    def _iter_chunks(self, variants):
+        variants = iter(variants)
+        while True:
+            chunk = [
+                v.rstrip('\r\n')
+                for v in itertools.islice(variants, self.current_batch_size)
+                ]
+            if not chunk:
+                return
+            yield chunk
+
+    def _lookup_chunk(self, chunk, params, ref_genome):
+        if self.cache is None:
+            return self._post_chunk(chunk, params, ref_genome)
+
+        keys = [self.cache.make_key(v, ref_genome, params) for v in chunk]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if not missing:
+            return [cached[key] for key in keys]
+
+        data = self._post_chunk(
+            [chunk[i] for i in missing],
+            params,
+            ref_genome
+            )
+        fetched = dict(zip((keys[i] for i in missing), data))
+        self.cache.set_many(fetched.items())
+        return [
+            cached[key] if key in cached else fetched[key]
+            for key in keys
+            ]
+
+    def _try_lookup_chunk(self, chunk, params, ref_genome):
+        """_lookup_chunk, returning the error instead of the results if
+        it fails with one of isolated_statuses"""
+        try:
+            return self._lookup_chunk(chunk, params, ref_genome), None
+        except VarsomeHTTPError as e:
+            if e.status not in self.isolated_statuses:
+                raise
+            return None, e
+
+    def _lookup_chunk_isolated(self, chunk, params, ref_genome):
+        """_lookup_chunk, but a chunk failing with one of
+        isolated_statuses is bisected until the failing variants are
+        found, which get error records as their results."""
+        data, error = self._try_lookup_chunk(chunk, params, ref_genome)
+        if error is None:
+            return data
+        if len(chunk) == 1:
+            return self._failed_variants(chunk, error)
+
+        size = -(-len(chunk) // self.isolation_parts)
+        parts = [chunk[i:i + size] for i in range(0, len(chunk), size)]
+        attempts = [
+            self._try_lookup_chunk(part, params, ref_genome)
+            for part in parts
+            ]
+        # the chunk error, until a request of a part of it succeeds
+        unresolved = [error]
+        if any(part_error is None for _, part_error in attempts):
+            del unresolved[:]
+        results = []
+        for part, (data, part_error) in zip(parts, attempts):
+            if part_error is None:
+                results.extend(data)
+            else:
+                results.extend(self._bisect_chunk(
+                    part, part_error, params, ref_genome, unresolved))
+        return results
+
+    def _bisect_chunk(self, chunk, error, params, ref_genome,
+                      unresolved=None):
+        """results of a chunk that failed with error, with error records
+        for the variants causing it.
+
+        :param unresolved: a list holding the error of the whole chunk
+            while none of its requests succeeded, emptied on the first
+            success. If a single variant fails while it is not empty,
+            that error is raised.
+        """
+        if len(chunk) == 1:
+            if unresolved:
+                raise unresolved[0]
+            return self._failed_variants(chunk, error)
+        middle = len(chunk) // 2
+        halves = [chunk[:middle], chunk[middle:]]
+        attempts = [
+            self._try_lookup_chunk(half, params, ref_genome)
+            for half in halves
+            ]
+        if unresolved and any(e is None for _, e in attempts):
+            del unresolved[:]
         results = []
-        for chunk in chunks:
-            data = self.post(
-                        self.batch_lookup_path.format(ref_genome),
-                        params=params,
-                        json_data={'variants': chunk}
-                        )
-            results.extend(data)
+        for half, (data, half_error) in zip(halves, attempts):
+            if half_error is None:
+                results.extend(data)
+            else:
+                results.extend(self._bisect_chunk(
+                    half, half_error, params, ref_genome, unresolved))
         return results
+
+    def _failed_variants(self, chunk, error):
+        logger.info('variant {} failed: {}'.format(chunk[0], error))
+        return [error_record(chunk[0], error)]
+
+    def _post_chunk(self, chunk, params, ref_genome):
+        tuner = self.batch_size_tuner
+        if tuner is None:
+            return self.post(
+                self.batch_lookup_path.format(ref_genome),
+                params=params,
+                json_data={'variants': chunk}
+                )
+
+        try:
+            return self._cached_request(
+                self.batch_lookup_path.format(ref_genome),
+                'POST',
+                params=params,
+                json_data={'variants': chunk},
+                on_response=lambda r: tuner.record(
+                    len(chunk),
+                    r.elapsed.total_seconds(),
+                    len(r.content)
+                    )
+                )
+        except VarsomeHTTPError as e:
+            # a 400 comes from the variants, not from load: no reason to
+            # shrink batches (bisecting one bad variant would halve the
+            # size a dozen times)
+            if e.status not in self.isolated_statuses:
+                tuner.record_error()
+            raise
+
+    def _map_ordered(self, func, items, workers=None, in_flight=None):
+        """yield func(item) for every item, in the order of items.
+
+        with more than one worker (max_workers by default) the calls run
+        on a thread pool, with at most in_flight (max_in_flight) of them
+        submitted ahead of the consumer.
+        """
+        workers = workers or self.max_workers
+        in_flight = in_flight or self.max_in_flight
+        if workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            try:
+                for item in items:
+                    if len(pending) >= in_flight:
+                        yield pending.popleft().result()
+                    pending.append(executor.submit(func, item))
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # don't start chunks nobody is waiting for anymore
+                for future in pending:
+                    future.cancel()
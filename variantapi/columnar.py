@@ -0,0 +1,254 @@
+"""columnar (parquet) export of lookup results.
+
+chosen annotation paths are flattened into typed columns and written
+as parquet row groups while results stream in, e.g.::
+
+    columns = ['chromosome', 'pos',
+               'gene=refseq_transcripts[0].items[].gene_symbol']
+    with ParquetResultWriter('out.parquet', columns,
+                             schema=api.schema()) as out:
+        out.write_all(api.iter_batch_lookup(variants))
+
+needs pyarrow (pip install variant_api[parquet]).
+"""
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    raise ImportError(
+        'parquet export needs pyarrow, install it with '
+        'pip install variant_api[parquet]'
+        )
+
+from variantapi.normalise import is_error_record
+from variantapi.projection import ALL, Projection, parse_path
+
+# type names used in api schemas
+_TYPES = {
+    'string': pyarrow.string(),
+    'str': pyarrow.string(),
+    'text': pyarrow.string(),
+    'integer': pyarrow.int64(),
+    'int': pyarrow.int64(),
+    'long': pyarrow.int64(),
+    'number': pyarrow.float64(),
+    'float': pyarrow.float64(),
+    'double': pyarrow.float64(),
+    'decimal': pyarrow.float64(),
+    'boolean': pyarrow.bool_(),
+    'bool': pyarrow.bool_(),
+    }
+
+
+def _schema_type(schema, steps):
+    """the arrow type of the value at steps according to an api schema,
+    None if the schema does not say."""
+    node = schema
+    for key, _ in steps:
+        if isinstance(node, dict):
+            # json schema style nesting
+            node = node.get('properties', node)
+            if isinstance(node.get('items'), dict) and key not in node:
+                node = node['items'].get('properties', node['items'])
+        if not isinstance(node, dict) or key not in node:
+            return None
+        node = node[key]
+        if isinstance(node, list) and len(node) == 1:
+            # a list of items described by its only element
+            node = node[0]
+    if isinstance(node, dict):
+        node = node.get('type')
+    if isinstance(node, list):
+        node = next((t for t in node if t != 'null'), None)
+    if not isinstance(node, str):
+        return None
+    return _TYPES.get(node.lower())
+
+
+def _values(value, steps):
+    """all values reached from value by following steps"""
+    if not steps:
+        return [value]
+    if isinstance(value, list):
+        return [v for item in value for v in _values(item, steps)]
+    key, select = steps[0]
+    if not isinstance(value, dict) or value.get(key) is None:
+        return []
+    value = value[key]
+    if isinstance(select, int):
+        if isinstance(value, list):
+            value = value[select:select + 1]
+        elif select:
+            return []
+    elif select == ALL and not isinstance(value, list):
+        value = [value]
+    return _values(value, steps[1:])
+
+
+def _scalar(value):
+    # nested values that were not flattened are kept as json text
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class Column(object):
+    """a column holding the values at a path of every result.
+
+    paths have the syntax of variantapi.projection.Projection. Paths
+    selecting every item of a list (key[]) make list columns, all others
+    hold the first value found, or null.
+
+    :param spec: 'path' or 'name=path'
+    """
+
+    def __init__(self, spec):
+        name, _, path = spec.rpartition('=')
+        self.path = path
+        self.name = name or path
+        self.steps = parse_path(path)
+        self.repeated = any(select == ALL for _, select in self.steps)
+        self.type = None
+
+    def extract(self, result):
+        values = [_scalar(v) for v in _values(result, self.steps)]
+        if self.repeated:
+            return values
+        return values[0] if values else None
+
+
+class ParquetResultWriter(object):
+    """writes lookup results as rows of a parquet file.
+
+    rows are buffered and written as a row group every row_group_size
+    results, so memory use does not grow with the input. Column types
+    come from the api schema where it describes a path, the others are
+    inferred from the first row group (text if all its values are
+    null).
+
+    two text columns follow the chosen ones: query, the query of a row
+    if it was passed to write, and error, which is null except for the
+    rows of error records (e.g. of variants rejected by validation).
+
+    :param path: output file
+    :param columns: list of column specs, see Column
+    :param schema: the response of VariantAPIClient.schema(), optional
+    :param row_group_size: results per row group
+    :param compression: parquet compression codec
+    """
+
+    def __init__(self, path, columns, schema=None, row_group_size=10000,
+                 compression='snappy'):
+        self.path = path
+        self.columns = [Column(c) for c in columns]
+        for column in self.columns:
+            if column.name in ('query', 'error'):
+                raise ValueError(
+                    'column name {} is reserved'.format(column.name))
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows = 0
+        self.row_groups = 0
+        for column in self.columns:
+            if schema is not None:
+                column.type = _schema_type(schema, column.steps)
+
+        self._buffer = []
+        self._schema = None
+        self._writer = None
+
+    @property
+    def projection(self):
+        """a Projection of the column paths, e.g. to request only the
+        source databases needed for them"""
+        return Projection([c.path for c in self.columns])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, result, query=None):
+        """add the row(s) of a result. Results that are lists (e.g. of
+        an HGVS query matching several variants) add a row per item.
+
+        :param query: the query of result, optional
+        """
+        if isinstance(result, list):
+            for r in result:
+                self.write(r, query)
+            return
+        if is_error_record(result):
+            row = [None for _ in self.columns]
+            row += [result['query'], result['error']]
+        else:
+            row = [c.extract(result) for c in self.columns]
+            row += [query, None]
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_all(self, results, queries=None):
+        """write all results, and their queries if given (in the same
+        order)"""
+        if queries is None:
+            for result in results:
+                self.write(result)
+        else:
+            for result, query in zip(results, queries):
+                self.write(result, query)
+
+    def _arrow_schema(self, rows):
+        fields = []
+        for i, column in enumerate(self.columns):
+            value_type = column.type
+            if value_type is None:
+                values = [row[i] for row in rows]
+                if column.repeated:
+                    values = [v for vs in values for v in vs]
+                value_type = pyarrow.array(values).type
+                if pyarrow.types.is_null(value_type):
+                    value_type = pyarrow.string()
+            if column.repeated:
+                value_type = pyarrow.list_(value_type)
+            fields.append(pyarrow.field(column.name, value_type))
+        fields.append(pyarrow.field('query', pyarrow.string()))
+        fields.append(pyarrow.field('error', pyarrow.string()))
+        return pyarrow.schema(fields)
+
+    def flush(self):
+        """write the buffered rows as a row group"""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        if self._writer is None:
+            self._schema = self._arrow_schema(rows)
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.path,
+                self._schema,
+                compression=self.compression
+                )
+        arrays = []
+        for i, field in enumerate(self._schema):
+            try:
+                arrays.append(pyarrow.array(
+                    [row[i] for row in rows], type=field.type))
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+                raise ValueError('values of column {} are not {}: {}'.format(
+                    field.name, field.type, e))
+        self._writer.write_table(
+            pyarrow.Table.from_arrays(arrays, schema=self._schema))
+        self.rows += len(rows)
+        self.row_groups += 1
+
+    def close(self):
+        self.flush()
+        if self._writer is None:
+            # no results, still write a valid (empty) file
+            self._schema = self._arrow_schema([])
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.path, self._schema, compression=self.compression)
+        self._writer.close()
@@ -0,0 +1,308 @@
+import bisect
+import collections
+import threading
+import time
+
+from variantapi.transfer import TransferStats
+
+# upper bounds in seconds, from decoding a small response to a slow batch
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+    )
+
+# one http response, passed to the hooks of ClientMetrics
+ResponseRecord = collections.namedtuple('ResponseRecord', [
+    'method', 'path', 'status', 'elapsed', 'download',
+    'sent_bytes', 'received_bytes',
+    ])
+
+
+class Histogram(object):
+    """counts observations in buckets with fixed upper bounds.
+
+    not thread safe on its own, ClientMetrics serialises access.
+
+    :param buckets: sorted upper bounds
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """estimate the q-quantile (0 <= q <= 1) by interpolating within
+        its bucket. None if nothing was observed."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    # beyond the last bound, the best guess is that bound
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def cumulative(self):
+        """(upper bound, count of observations <= bound) pairs, the last
+        bound being infinity"""
+        total = 0
+        bounds = self.buckets + (float('inf'),)
+        pairs = []
+        for bound, n in zip(bounds, self.counts):
+            total += n
+            pairs.append((bound, total))
+        return pairs
+
+
+class ClientMetrics(object):
+    """timing, throughput and error counts of a client.
+
+    every api call (get or post, including retries and backoff) is
+    timed, and so are the stages of each http response, which tells
+    whether time goes to the network, the server or local parsing:
+
+    * request: until the response headers arrived (server time plus
+      round trip)
+    * download: reading and decompressing the response body
+    * decode: parsing the json body
+
+    all durations are in seconds and kept in histograms per http
+    method. Bytes are counted in transfer (see TransferStats), cache
+    hits are read from the caches registered with add_cache.
+
+    :param buckets: histogram upper bounds
+    """
+
+    STAGES = ('call', 'request', 'download', 'decode')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.hooks = []
+
+        self._lock = threading.Lock()
+        self._caches = collections.OrderedDict()
+        self.reset()
+
+    def reset(self):
+        """forget all observations (registered caches and hooks stay)"""
+        with self._lock:
+            self._histograms = {}
+            self.responses = collections.Counter()
+            self.retries = collections.Counter()
+            self.errors = collections.Counter()
+            self.variants = 0
+            self._first_call = None
+            self._last_variants = None
+            self.transfer = TransferStats()
+
+    def add_cache(self, name, cache):
+        """report hits and misses of a cache (anything with hits and
+        misses attributes, e.g. SQLiteCache or LRUCache) under name."""
+        self._caches[name] = cache
+
+    def add_hook(self, hook):
+        """call hook(record) with a ResponseRecord after every response.
+
+        hooks run on the thread that made the request and must be fast.
+        """
+        self.hooks.append(hook)
+
+    def _observe(self, stage, method, seconds):
+        key = (stage, method)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def histogram(self, stage, method):
+        """the Histogram of a stage (see STAGES) for an http method, None
+        if there were no observations."""
+        return self._histograms.get((stage, method))
+
+    def call_started(self):
+        with self._lock:
+            if self._first_call is None:
+                self._first_call = time.time()
+
+    def record_call(self, method, seconds):
+        with self._lock:
+            self._observe('call', method, seconds)
+
+    def record_response(self, method, path, status, elapsed, download,
+                        sent_wire, sent_payload, received_wire,
+                        received_payload):
+        with self._lock:
+            self.responses[(method, status)] += 1
+            self._observe('request', method, elapsed)
+            self._observe('download', method, download)
+        self.transfer.record(
+            sent_wire, sent_payload, received_wire, received_payload)
+        if self.hooks:
+            record = ResponseRecord(
+                method, path, status, elapsed, download,
+                sent_wire, received_wire)
+            for hook in self.hooks:
+                hook(record)
+
+    def record_decode(self, method, seconds):
+        with self._lock:
+            self._observe('decode', method, seconds)
+
+    def record_retry(self, method):
+        with self._lock:
+            self.retries[method] += 1
+
+    def record_error(self, method, error):
+        """count a request that failed without a response"""
+        with self._lock:
+            self.errors[(method, type(error).__name__)] += 1
+
+    def record_variants(self, n):
+        """count n annotated variants, looked up or taken from a cache"""
+        with self._lock:
+            self.variants += n
+            self._last_variants = time.time()
+
+    @property
+    def variants_per_second(self):
+        """variants annotated per second from the first call to the
+        latest annotated variant"""
+        with self._lock:
+            if self._first_call is None or self._last_variants is None:
+                return 0.0
+            seconds = self._last_variants - self._first_call
+        return self.variants / seconds if seconds > 0 else 0.0
+
+    def cache_stats(self):
+        """name -> (hits, misses) of the registered caches"""
+        return collections.OrderedDict(
+            (name, (cache.hits, cache.misses))
+            for name, cache in self._caches.items()
+            )
+
+    def summary(self):
+        """a dictionary of the main figures, e.g. for logging as json"""
+        with self._lock:
+            latency = {}
+            for (stage, method), h in sorted(self._histograms.items()):
+                latency['{}_{}'.format(method, stage)] = {
+                    'count': h.count,
+                    'mean': h.sum / h.count,
+                    'p50': h.quantile(0.5),
+                    'p99': h.quantile(0.99),
+                    }
+            summary = {
+                'latency': latency,
+                'responses': dict(
+                    ('{} {}'.format(m, s), n)
+                    for (m, s), n in self.responses.items()
+                    ),
+                'retries': sum(self.retries.values()),
+                'errors': sum(self.errors.values()),
+                'variants': self.variants,
+                }
+        summary['variants_per_second'] = self.variants_per_second
+        summary['bytes'] = {
+            'sent': self.transfer.request_wire_bytes,
+            'sent_uncompressed': self.transfer.request_payload_bytes,
+            'received': self.transfer.response_wire_bytes,
+            'received_uncompressed': self.transfer.response_payload_bytes,
+            }
+        summary['caches'] = dict(
+            (name, {'hits': hits, 'misses': misses})
+            for name, (hits, misses) in self.cache_stats().items()
+            )
+        return summary
+
+    def prometheus(self, prefix='variantapi'):
+        """the metrics in the prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help, samples):
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for suffix, labels, value in samples:
+                label = ','.join(
+                    '{}="{}"'.format(k, v) for k, v in labels)
+                lines.append('{}{}{} {}'.format(
+                    name, suffix, '{' + label + '}' if label else '',
+                    _format_value(value)))
+
+        helps = {
+            'call': 'Duration of api calls including retries',
+            'request': 'Time until response headers arrived',
+            'download': 'Time reading and decompressing response bodies',
+            'decode': 'Time parsing json response bodies',
+            }
+        with self._lock:
+            for stage in self.STAGES:
+                samples = []
+                for (s, method), h in sorted(self._histograms.items()):
+                    if s != stage:
+                        continue
+                    labels = [('method', method)]
+                    for bound, count in h.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        samples.append(
+                            ('_bucket', labels + [('le', le)], count))
+                    samples.append(('_sum', labels, h.sum))
+                    samples.append(('_count', labels, h.count))
+                if samples:
+                    metric('{}_seconds'.format(stage), 'histogram',
+                           helps[stage], samples)
+
+            metric('responses_total', 'counter', 'HTTP responses', [
+                ('', [('method', m), ('status', s)], n)
+                for (m, s), n in sorted(self.responses.items())
+                ])
+            metric('retries_total', 'counter', 'Retried requests', [
+                ('', [('method', m)], n)
+                for m, n in sorted(self.retries.items())
+                ])
+            metric('errors_total', 'counter',
+                   'Requests that failed without a response', [
+                       ('', [('method', m), ('error', e)], n)
+                       for (m, e), n in sorted(self.errors.items())
+                       ])
+            metric('variants_total', 'counter', 'Annotated variants',
+                   [('', [], self.variants)])
+
+        t = self.transfer
+        metric('sent_bytes_total', 'counter', 'Request body bytes', [
+            ('', [('encoding', 'wire')], t.request_wire_bytes),
+            ('', [('encoding', 'identity')], t.request_payload_bytes),
+            ])
+        metric('received_bytes_total', 'counter', 'Response body bytes', [
+            ('', [('encoding', 'wire')], t.response_wire_bytes),
+            ('', [('encoding', 'identity')], t.response_payload_bytes),
+            ])
+        caches = self.cache_stats()
+        if caches:
+            metric('cache_hits_total', 'counter', 'Cache hits', [
+                ('', [('cache', name)], hits)
+                for name, (hits, _) in caches.items()
+                ])
+            metric('cache_misses_total', 'counter', 'Cache misses', [
+                ('', [('cache', name)], misses)
+                for name, (_, misses) in caches.items()
+                ])
+        return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
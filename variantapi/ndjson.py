@@ -0,0 +1,65 @@
+import gzip
+import io
+import json
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class NDJSONWriter(object):
+    """writes one compact json document per line (newline delimited json).
+
+    lines are written as they come, so output starts immediately and
+    nothing but the current document is held in memory.
+
+    :param path: output file
+    :param compress: gzip the output. Defaults to True if path ends
+        with .gz
+    """
+
+    def __init__(self, path, compress=None):
+        if compress is None:
+            compress = path.endswith('.gz')
+        self.path = path
+        self.compressed = compress
+        self.lines = 0
+        self.offset = 0
+        if compress:
+            self._file = gzip.open(path, 'wb')
+        else:
+            self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, obj):
+        """write obj as a single line.
+
+        :return: offset of the line in the uncompressed output
+        """
+        line = (json.dumps(obj, separators=(',', ':')) + '\n').encode('utf8')
+        offset = self.offset
+        self._file.write(line)
+        self.offset += len(line)
+        self.lines += 1
+        return offset
+
+    def write_all(self, objs):
+        for obj in objs:
+            self.write(obj)
+
+    def close(self):
+        self._file.close()
+
+
+def iter_ndjson(path):
+    """lazily yield the documents of a (possibly gzipped) ndjson file."""
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == _GZIP_MAGIC
+    opener = gzip.open if compressed else io.open
+    with opener(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line.decode('utf8'))
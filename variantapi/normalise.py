@@ -0,0 +1,102 @@
+"""local validation and normalisation of variant queries.
+
+the api accepts chrom:pos:ref:alt variants, rsIDs and HGVS notations
+(e.g. CCR5:c.*1712delG or NM_000059.3:c.68_69delAG). Queries that match
+none of them are rejected here instead of costing a round trip, or
+failing a whole batch with a 400.
+
+ref or alt may be empty, for insertions (chr22:39777823::CAA) and
+deletions (chr1:100:AA:) without an anchor base, which is also the form
+trimming shared bases leaves them in. ref may be a number of deleted
+bases instead (chr19:20082943:1:G). Variants without ref and alt are
+rejected.
+"""
+import re
+
+_VARIANT = re.compile(
+    r'^(?:chr)?([0-9A-Za-z_.]+)[:\-](\d+)[:\-]([ACGTNacgtn]*|\d+)[:\-]'
+    r'([ACGTNacgtn]*(?:,[ACGTNacgtn]*)*)$',
+    re.IGNORECASE
+    )
+_RSID = re.compile(r'^rs(\d+)$', re.IGNORECASE)
+_HGVS = re.compile(
+    r'^[A-Za-z0-9_.\-]+(?:\([A-Za-z0-9_.\-]+\))?:[cgmnpr]\.\S+$')
+
+_CHROMOSOMES = dict(
+    [(str(n), 'chr{}'.format(n)) for n in range(1, 23)]
+    + [('X', 'chrX'), ('Y', 'chrY'), ('M', 'chrM'), ('MT', 'chrM')]
+    )
+
+
+class InvalidVariantError(ValueError):
+    pass
+
+
+def canonical_chromosome(chrom):
+    """return chrom as chr1..chr22, chrX, chrY or chrM, e.g. for 01, X,
+    chrx or MT. Other names (e.g. of contigs) are returned as they are."""
+    name = chrom[3:] if chrom[:3].lower() == 'chr' else chrom
+    name = name.upper().lstrip('0') or name
+    return _CHROMOSOMES.get(name, chrom)
+
+
+def trim_alleles(pos, ref, alt):
+    """remove the bases ref and alt share at their end and then at their
+    start, return the (pos, ref, alt) left. e.g. 100 CTT CGT -> 101 T G"""
+    while ref and alt and ref[-1] == alt[-1]:
+        ref, alt = ref[:-1], alt[:-1]
+    start = 0
+    while start < len(ref) and start < len(alt) and ref[start] == alt[start]:
+        start += 1
+    return pos + start, ref[start:], alt[start:]
+
+
+def normalise_variant(query):
+    """validate a query and return the list of normalised queries for it.
+
+    chrom:pos:ref:alt variants get a canonical chromosome name and
+    upper case bases without the bases ref and alt share, and one
+    query per ALT allele if alt lists several (e.g. chr1:100:A:T,G).
+    rsIDs are lower cased, HGVS notations are kept as they are.
+
+    :raises InvalidVariantError: if the query has none of the accepted
+        forms, or is not a variant (no ref and alt, or ref equals alt)
+    """
+    query = query.strip()
+    match = _VARIANT.match(query)
+    if match is not None:
+        chrom, pos, ref, alts = match.groups()
+        pos = int(pos)
+        if pos < 1:
+            raise InvalidVariantError(
+                'invalid position in {!r}'.format(query))
+        chrom = canonical_chromosome(chrom)
+        ref = ref.upper()
+        queries = []
+        for alt in alts.upper().split(','):
+            if ref.isdigit():
+                # the number of deleted bases, nothing to trim
+                variant = (pos, ref, alt)
+            else:
+                if ref == alt:
+                    raise InvalidVariantError(
+                        'ref equals alt in {!r}'.format(query))
+                variant = trim_alleles(pos, ref, alt)
+            queries.append('{}:{}:{}:{}'.format(chrom, *variant))
+        return queries
+
+    match = _RSID.match(query)
+    if match is not None:
+        return ['rs' + match.group(1)]
+    if _HGVS.match(query):
+        return [query]
+    raise InvalidVariantError('unsupported variant notation {!r}'.format(query))
+
+
+def error_record(query, error):
+    """the result returned for a query that could not be looked up"""
+    return {'query': query.strip(), 'error': str(error)}
+
+
+def is_error_record(result):
+    return isinstance(result, dict) and set(result) == {'query', 'error'}
@@ -0,0 +1,96 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    pass
+
+
+def run_pipeline(source, process, sink, workers=4, max_pending=None):
+    """run source -> process -> sink with the stages overlapping.
+
+    a reader thread pulls items from source, a pool of worker threads
+    calls process(item) on them, and the calling thread passes every
+    result to sink(result) in the order the items came from source.
+
+    at most max_pending items (default 2 * workers) are between the
+    reader and the sink at any time, which bounds memory use when one
+    stage is slower than the others.
+
+    the first exception raised by any stage stops the pipeline and is
+    raised again here.
+
+    :param source: iterable of items
+    :param process: function called on a worker thread for every item
+    :param sink: function called on the calling thread for every result
+    :param workers: number of worker threads
+    :param max_pending: maximum number of items in flight
+    """
+    max_pending = max_pending or 2 * workers
+    slots = threading.Semaphore(max_pending)
+    tasks = queue.Queue()
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def acquire_slot():
+        while not slots.acquire(timeout=0.1):
+            if stop.is_set():
+                raise _Stopped()
+
+    def read():
+        count = 0
+        try:
+            for item in source:
+                acquire_slot()
+                tasks.put((count, item))
+                count += 1
+        except _Stopped:
+            return
+        except BaseException as e:
+            results.put(('error', None, e))
+            return
+        finally:
+            for _ in range(workers):
+                tasks.put(_DONE)
+        results.put(('end', count, None))
+
+    def work():
+        while not stop.is_set():
+            task = tasks.get()
+            if task is _DONE:
+                return
+            seq, item = task
+            try:
+                results.put(('result', seq, process(item)))
+            except BaseException as e:
+                results.put(('error', seq, e))
+                return
+
+    threads = [threading.Thread(target=read)]
+    threads += [threading.Thread(target=work) for _ in range(workers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    buffered = {}
+    next_seq = 0
+    total = None
+    try:
+        while total is None or next_seq < total:
+            kind, seq, value = results.get()
+            if kind == 'error':
+                raise value
+            if kind == 'end':
+                total = seq
+                continue
+            buffered[seq] = value
+            while next_seq in buffered:
+                sink(buffered.pop(next_seq))
+                next_seq += 1
+                slots.release()
+    finally:
+        stop.set()
+    for t in threads:
+        t.join()
@@ -0,0 +1,114 @@
+import re
+
+_STEP = re.compile(r'^([^\[\]]+)(?:\[(\d*)\])?$')
+
+ALL = 'all'
+
+
+def parse_path(path):
+    """split a path into (key, select) steps. select is None, ALL for
+    key[] or the index n for key[n]."""
+    steps = []
+    for step in path.split('.'):
+        match = _STEP.match(step)
+        if match is None:
+            raise ValueError('invalid projection path {!r}'.format(path))
+        key, index = match.groups()
+        select = None
+        if index is not None:
+            select = ALL if index == '' else int(index)
+        steps.append((key, select))
+    return steps
+
+
+class Projection(object):
+    """selects the annotation paths a caller needs from api responses.
+
+    a path is a dot separated list of keys. A key followed by [] selects
+    every item of a list, followed by [n] only its n-th item (kept in a
+    one item list, so the result has the shape of the full response).
+    Lists reached without a selector are projected item by item. e.g.::
+
+        Projection([
+            'chromosome',
+            'refseq_transcripts[0].items[].gene_symbol',
+            ])
+
+    besides extracting the paths from responses, a projection chooses
+    the request params needed for them: every top level key that is not
+    part of the core annotation (see CORE_FIELDS) is requested as a
+    source database, e.g. refseq_transcripts as refseq-transcripts.
+
+    :param paths: list of paths to keep
+    """
+    CORE_FIELDS = frozenset([
+        'chromosome', 'pos', 'ref', 'alt', 'variant_id', 'variant_type',
+        'cytobands', 'original_variant', 'query',
+        ])
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._tree = {}
+        for path in self.paths:
+            self._add(path)
+
+    def _add(self, path):
+        node = self._tree
+        steps = parse_path(path)
+        for i, (key, select) in enumerate(steps):
+            last = i == len(steps) - 1
+            entry = node.get(key)
+            if entry is None:
+                entry = node[key] = [select, None if last else {}]
+            else:
+                if entry[0] != select:
+                    # the same key selected differently by two paths
+                    entry[0] = ALL
+                if last or entry[1] is None:
+                    # a shorter path keeps the whole value
+                    entry[1] = None
+                    return
+            node = entry[1]
+
+    def params(self, params=None):
+        """return the request params needed for the projection.
+
+        :param params: params of the caller, they take precedence
+        """
+        databases = sorted(
+            key.replace('_', '-') for key in self._tree
+            if key not in self.CORE_FIELDS
+            )
+        projected = {}
+        if databases:
+            projected['add-source-databases'] = ','.join(databases)
+        projected.update(params or {})
+        return projected
+
+    def extract(self, result):
+        """return result reduced to the paths of the projection.
+
+        results that are lists of variants (e.g. for HGVS queries) are
+        projected variant by variant.
+        """
+        if isinstance(result, list):
+            return [self.extract(r) for r in result]
+        return _project(self._tree, result)
+
+
+def _project(tree, value):
+    if isinstance(value, list):
+        return [_project(tree, v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for key, (select, children) in tree.items():
+        if key not in value:
+            continue
+        v = value[key]
+        if isinstance(select, int) and isinstance(v, list):
+            v = v[select:select + 1]
+        if children is not None:
+            v = _project(children, v)
+        projected[key] = v
+    return projected
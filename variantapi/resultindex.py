@@ -0,0 +1,290 @@
+"""random access into saved ndjson results.
+
+an index file written next to an (uncompressed) ndjson output maps the
+query and the variant_id of every result to the offset of its line, and
+keeps the offsets sorted by chromosome and position, e.g.::
+
+    with NDJSONWriter('out.ndjson') as out, \\
+            ResultIndexWriter('out.ndjson.idx') as index:
+        for query, result in zip(queries, results):
+            index.add(out.write(result), result, query)
+
+    with ResultIndex('out.ndjson') as results:
+        results.get('chr19:20082943:1:G')
+        results.range('chr19', 20000000, 21000000)
+
+both files are memory mapped by ResultIndex, so a lookup reads a few
+pages of them instead of the whole output. The index file has a header,
+the chromosome names (a json list), an open addressing hash table of
+(key hash, key offset, line offset) slots, the (chromosome, position,
+line offset) entries sorted by position, and the keys.
+"""
+import array
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from variantapi.normalise import canonical_chromosome
+
+_MAGIC = b'VRIX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIQQQ')
+_SLOT = struct.Struct('<QQQ')
+_POSITION = struct.Struct('<QQQ')
+_KEY_LENGTH = struct.Struct('<I')
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _hash(key):
+    h = int.from_bytes(
+        hashlib.blake2b(key, digest_size=8).digest(), 'little')
+    # 0 marks empty slots
+    return h or 1
+
+
+def index_path_for(path):
+    """default index file of an ndjson output"""
+    return path + '.idx'
+
+
+class ResultIndexWriter(object):
+    """builds the index of an ndjson output while it is written.
+
+    only the key hashes, offsets and positions are held in memory until
+    close, keys are spooled to a temporary file.
+
+    :param path: index file, written on close
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = 0
+        self._hashes = array.array('Q')
+        self._key_offsets = array.array('Q')
+        self._offsets = array.array('Q')
+        self._chromosomes = {}
+        self._positions = []
+        self._keys = tempfile.TemporaryFile()
+        self._keys_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._keys.close()
+
+    def _add_key(self, key, offset):
+        key = str(key).strip().encode('utf8')
+        self._hashes.append(_hash(key))
+        self._key_offsets.append(self._keys_size)
+        self._offsets.append(offset)
+        self._keys.write(_KEY_LENGTH.pack(len(key)))
+        self._keys.write(key)
+        self._keys_size += _KEY_LENGTH.size + len(key)
+
+    def add(self, offset, result, query=None):
+        """index the line at offset holding result.
+
+        :param offset: offset of the line, as returned by
+            NDJSONWriter.write
+        :param result: the result written. A list of results (e.g. of an
+            HGVS query) is indexed by the variant ids and positions of
+            all of them.
+        :param query: the query looked up, optional. Error records are
+            indexed by their 'query'.
+        """
+        if query is not None:
+            self._add_key(query, offset)
+        for item in result if isinstance(result, list) else [result]:
+            if not isinstance(item, dict):
+                continue
+            if query is None and 'error' in item and 'query' in item:
+                self._add_key(item['query'], offset)
+            if item.get('variant_id') is not None:
+                self._add_key(item['variant_id'], offset)
+            chromosome, pos = item.get('chromosome'), item.get('pos')
+            if chromosome is not None and isinstance(pos, int):
+                chromosome = canonical_chromosome(str(chromosome))
+                chromosome_id = self._chromosomes.setdefault(
+                    chromosome, len(self._chromosomes))
+                self._positions.append((chromosome_id, pos, offset))
+        self.entries += 1
+
+    def close(self):
+        slots = 1
+        while slots < 2 * len(self._hashes):
+            slots *= 2
+        mask = slots - 1
+        table = bytearray(slots * _SLOT.size)
+        for h, key_offset, offset in zip(
+                self._hashes, self._key_offsets, self._offsets):
+            i = h & mask
+            while _SLOT.unpack_from(table, i * _SLOT.size)[0]:
+                i = (i + 1) & mask
+            _SLOT.pack_into(table, i * _SLOT.size, h, key_offset, offset)
+
+        self._positions.sort()
+        chromosomes = sorted(self._chromosomes, key=self._chromosomes.get)
+        names = json.dumps(chromosomes).encode('utf8')
+        with open(self.path, 'wb') as f:
+            f.write(_HEADER.pack(
+                _MAGIC, _VERSION, slots, len(self._positions), len(names)))
+            f.write(names)
+            f.write(table)
+            for position in self._positions:
+                f.write(_POSITION.pack(*position))
+            self._keys.seek(0)
+            shutil.copyfileobj(self._keys, f)
+        self._keys.close()
+
+
+def build_index(path, index_path=None):
+    """index an existing (uncompressed) ndjson output. Queries are not
+    stored in the results, so only error records are found by query.
+
+    :return: path of the index file
+    """
+    index_path = index_path or index_path_for(path)
+    with open(path, 'rb') as f, ResultIndexWriter(index_path) as index:
+        offset = 0
+        for line in f:
+            if line.strip():
+                index.add(offset, json.loads(line.decode('utf8')))
+            offset += len(line)
+    return index_path
+
+
+class ResultIndex(object):
+    """reads results of an indexed ndjson output.
+
+    :param path: the ndjson output (not gzipped)
+    :param index_path: its index file, path + '.idx' by default
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        with open(path, 'rb') as f:
+            if f.read(2) == _GZIP_MAGIC:
+                raise ValueError(
+                    '{} is compressed, only uncompressed outputs can be '
+                    'indexed'.format(path))
+        self._data = self._map(path)
+        self._index = self._map(self.index_path)
+        magic, version, self._slots, self.positions, names_size = \
+            _HEADER.unpack_from(self._index, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(
+                '{} is not a result index'.format(self.index_path))
+
+        start = _HEADER.size
+        self.chromosomes = json.loads(
+            self._index[start:start + names_size].decode('utf8'))
+        self._chromosome_ids = dict(
+            (name, i) for i, name in enumerate(self.chromosomes))
+        self._slots_start = start + names_size
+        self._positions_start = self._slots_start + self._slots * _SLOT.size
+        self._keys_start = (
+            self._positions_start + self.positions * _POSITION.size)
+
+    @staticmethod
+    def _map(path):
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                # empty files can not be mapped
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        for mapped in (self._data, self._index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def _key(self, key_offset):
+        start = self._keys_start + key_offset
+        size, = _KEY_LENGTH.unpack_from(self._index, start)
+        start += _KEY_LENGTH.size
+        return self._index[start:start + size]
+
+    def offset(self, key):
+        """offset of the line of the query or variant id key, None if
+        it is not in the index"""
+        key = str(key).strip().encode('utf8')
+        h = _hash(key)
+        mask = self._slots - 1
+        i = h & mask
+        while True:
+            slot_hash, key_offset, offset = _SLOT.unpack_from(
+                self._index, self._slots_start + i * _SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == h and self._key(key_offset) == key:
+                return offset
+            i = (i + 1) & mask
+
+    def read(self, offset):
+        """the result stored in the line at offset"""
+        end = self._data.find(b'\n', offset)
+        if end < 0:
+            end = len(self._data)
+        return json.loads(self._data[offset:end].decode('utf8'))
+
+    def get(self, key, default=None):
+        """the result of a query or variant id"""
+        offset = self.offset(key)
+        if offset is None:
+            return default
+        return self.read(offset)
+
+    def __contains__(self, key):
+        return self.offset(key) is not None
+
+    def __getitem__(self, key):
+        offset = self.offset(key)
+        if offset is None:
+            raise KeyError(key)
+        return self.read(offset)
+
+    def _lower_bound(self, key):
+        low, high = 0, self.positions
+        while low < high:
+            middle = (low + high) // 2
+            entry = _POSITION.unpack_from(
+                self._index, self._positions_start + middle * _POSITION.size)
+            if entry[:2] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, chromosome, start=1, end=None):
+        """yield the results on chromosome with start <= pos <= end, by
+        position. Lines holding several results are yielded once."""
+        chromosome_id = self._chromosome_ids.get(
+            canonical_chromosome(str(chromosome)))
+        if chromosome_id is None:
+            return
+        seen = set()
+        for i in range(self._lower_bound((chromosome_id, start)),
+                       self.positions):
+            entry_chromosome, pos, offset = _POSITION.unpack_from(
+                self._index, self._positions_start + i * _POSITION.size)
+            if entry_chromosome != chromosome_id or (
+                    end is not None and pos > end):
+                return
+            if offset not in seen:
+                seen.add(offset)
+                yield self.read(offset)
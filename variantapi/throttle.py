@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+
+
+class AdaptiveRateLimiter(object):
+    """token bucket limiting the rate of requests sent to the api.
+
+    the rate adapts to the responses: every throttled response (403/429)
+    halves it, every successful one raises it again by a small step, up
+    to max_rate. Sustained throughput therefore settles just below the
+    quota the server enforces.
+
+    :param rate: initial number of requests per second
+    :param burst: number of requests that may be sent at once after an
+        idle period. Defaults to one second worth of requests.
+    :param max_rate: upper bound of the rate, defaults to rate
+    :param min_rate: lower bound of the rate
+    :param increase: requests per second added after each success
+    :param decrease: factor the rate is multiplied with when throttled
+    """
+
+    def __init__(self, rate, burst=None, max_rate=None, min_rate=0.1,
+                 increase=0.1, decrease=0.5):
+        self.rate = float(rate)
+        self.burst = burst or max(1.0, self.rate)
+        self.max_rate = max_rate or self.rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.burst,
+            self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def acquire(self):
+        """block until a request may be sent."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # drop the saved up burst, the server just told us to slow down
+            self._tokens = 0
+
+
+class RetryPolicy(object):
+    """decides whether and when a failed request is sent again.
+
+    delays grow exponentially with the attempt number and are jittered
+    so that concurrent workers don't retry in lockstep. A Retry-After
+    header sent by the server takes precedence.
+
+    :param max_retries: number of times a request is retried
+    :param backoff: base delay in seconds
+    :param max_backoff: upper bound of a single delay in seconds
+    :param statuses: http status codes that are retried
+    """
+    THROTTLE_STATUSES = (403, 429)
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=60,
+                 statuses=(403, 429, 502, 503, 504)):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def should_retry(self, attempt, status=None):
+        """status is None for connection errors and timeouts."""
+        if attempt >= self.max_retries:
+            return False
+        return status is None or status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(seconds, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+
+def parse_retry_after(value):
+    """return the seconds to wait from a Retry-After header, or None."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # only http dates need the (slow to import) email package
+    import email.utils
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
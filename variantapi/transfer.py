@@ -0,0 +1,71 @@
+import gzip
+import threading
+import zlib
+
+CONTENT_ENCODINGS = ('gzip', 'deflate')
+
+
+def encode_body(body, encoding):
+    """return body (bytes) compressed with a Content-Encoding.
+
+    :param encoding: gzip or deflate (zlib format, as http specifies)
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    if encoding == 'deflate':
+        return zlib.compress(body, 6)
+    raise ValueError('unsupported content encoding {!r}'.format(encoding))
+
+
+class TransferStats(object):
+    """counts the bytes sent and received by a client.
+
+    every body is counted twice: as it travels over the network
+    (wire, i.e. compressed if it was) and as the json it encodes
+    (payload), so the ratios tell whether compression pays off.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.compressed_requests = 0
+        self.request_wire_bytes = 0
+        self.request_payload_bytes = 0
+        self.response_wire_bytes = 0
+        self.response_payload_bytes = 0
+
+    def record(self, request_wire, request_payload, response_wire,
+               response_payload):
+        with self._lock:
+            self.requests += 1
+            if request_wire != request_payload:
+                self.compressed_requests += 1
+            self.request_wire_bytes += request_wire
+            self.request_payload_bytes += request_payload
+            self.response_wire_bytes += response_wire
+            self.response_payload_bytes += response_payload
+
+    @staticmethod
+    def _ratio(wire, payload):
+        return float(wire) / payload if payload else 1.0
+
+    @property
+    def request_ratio(self):
+        """bytes sent per byte of request payload"""
+        return self._ratio(self.request_wire_bytes, self.request_payload_bytes)
+
+    @property
+    def response_ratio(self):
+        """bytes received per byte of response payload"""
+        return self._ratio(
+            self.response_wire_bytes,
+            self.response_payload_bytes
+            )
+
+    def __str__(self):
+        return (
+            'sent {} bytes ({} uncompressed), '
+            'received {} bytes ({} uncompressed)'.format(
+                self.request_wire_bytes, self.request_payload_bytes,
+                self.response_wire_bytes, self.response_payload_bytes)
+            )
@@ -0,0 +1,103 @@
+import threading
+
+
+class BatchSizeTuner(object):
+    """chooses the number of variants per batch request from observations.
+
+    the latency of a batch is modelled as a fixed per request part
+    (round trip, authentication, queueing) plus a part growing with the
+    number of variants. Both are fitted to moving averages of the
+    observed batches, and the next batch size is the one expected to
+    take target_latency seconds (and, if set, to stay below
+    max_response_bytes). Sizes grow at most twofold per batch, failed
+    batches halve the size.
+
+    :param target_latency: seconds a single batch request should take
+    :param initial_size: size of the first batch
+    :param min_size: smallest batch size
+    :param max_size: largest batch size, the api accepts up to 10000
+    :param max_response_bytes: optional upper bound of a response size
+    :param smoothing: weight of the newest observation in the averages
+    """
+
+    def __init__(self, target_latency, initial_size=100, min_size=1,
+                 max_size=10000, max_response_bytes=None, smoothing=0.3):
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_response_bytes = max_response_bytes
+        self.smoothing = smoothing
+        self.size = max(min_size, min(initial_size, max_size))
+        self.batches = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        # moving averages of batch sizes n, latencies t, n * n and n * t
+        self._n = None
+        self._t = None
+        self._nn = None
+        self._nt = None
+        self._bytes_per_variant = None
+
+    def _average(self, current, value):
+        if current is None:
+            return value
+        return current + self.smoothing * (value - current)
+
+    def latency_model(self):
+        """return (seconds per request, seconds per variant) fitted to
+        the observed batches, None before the first one.
+
+        a least squares line through the averaged observations. Until
+        batches of different sizes were seen, or if the fit makes no
+        sense (e.g. because of noise), all latency is attributed to the
+        variants, which overestimates the latency of small batches.
+        """
+        if self._n is None:
+            return None
+        variance = self._nn - self._n ** 2
+        if variance > 1e-6 * self._nn:
+            per_variant = (self._nt - self._n * self._t) / variance
+            base = self._t - per_variant * self._n
+            if per_variant > 0 and base >= 0:
+                return base, per_variant
+        return 0.0, self._t / self._n
+
+    def record(self, n_variants, elapsed, n_bytes):
+        """record a successful batch of n_variants.
+
+        :param elapsed: seconds between request and response
+        :param n_bytes: size of the response body
+        """
+        if not n_variants:
+            return
+        with self._lock:
+            self.batches += 1
+            self._n = self._average(self._n, n_variants)
+            self._t = self._average(self._t, elapsed)
+            self._nn = self._average(self._nn, n_variants ** 2)
+            self._nt = self._average(self._nt, n_variants * elapsed)
+            self._bytes_per_variant = self._average(
+                self._bytes_per_variant,
+                float(n_bytes) / n_variants
+                )
+
+            size = self.size * 2
+            base, per_variant = self.latency_model()
+            if per_variant > 0:
+                size = min(
+                    size,
+                    (self.target_latency - base) / per_variant
+                    )
+            if self.max_response_bytes and self._bytes_per_variant > 0:
+                size = min(
+                    size,
+                    self.max_response_bytes / self._bytes_per_variant
+                    )
+            self.size = int(max(self.min_size, min(size, self.max_size)))
+
+    def record_error(self):
+        with self._lock:
+            self.batches += 1
+            self.errors += 1
+            self.size = max(self.min_size, self.size // 2)
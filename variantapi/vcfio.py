@@ -0,0 +1,379 @@
+"""minimal streaming VCF reader and writer.
+
+only the columns needed to build variant queries are decoded, and only
+when they are accessed. Records keep their raw line, and columns that
+are not modified are written back byte for byte. Plain, gzip and bgzip
+compressed files are supported.
+
+files can be split into shards that are read independently, e.g. by
+separate processes: plain files by byte range, bgzip compressed files
+by chromosome if a tabix (.tbi) or CSI (.csi) index is present.
+"""
+import gzip
+import io
+import os
+import struct
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO = range(8)
+
+
+def open_vcf(path, mode='r'):
+    """open a VCF file as text, (b)gzip compressed or not.
+
+    compressed input is detected from its content, output is compressed
+    if path ends with .gz
+    """
+    if 'r' in mode:
+        with open(path, 'rb') as f:
+            compressed = f.read(2) == _GZIP_MAGIC
+    else:
+        compressed = path.endswith('.gz')
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf8', newline='')
+    return io.open(path, mode, encoding='utf8', newline='')
+
+
+def set_info_value(info, key, value):
+    """return the INFO column info with key set to value."""
+    entry = key if value is None else '{}={}'.format(key, value)
+    if info in ('', '.'):
+        return entry
+    entries = info.split(';')
+    for i, e in enumerate(entries):
+        if e == key or e.startswith(key + '='):
+            entries[i] = entry
+            return ';'.join(entries)
+    entries.append(entry)
+    return ';'.join(entries)
+
+
+def remove_info_value(info, key):
+    """return the INFO column info without key."""
+    entries = [
+        e for e in info.split(';')
+        if e != key and not e.startswith(key + '=')
+        ]
+    return ';'.join(entries) or '.'
+
+
+class VCFHeader(object):
+    """meta information lines and the column header line of a VCF file."""
+
+    def __init__(self, meta, columns):
+        self.meta = meta
+        self.columns = columns
+
+    @property
+    def samples(self):
+        return self.columns[9:]
+
+    def add_info(self, id, number, type, description):
+        """add an INFO definition, replacing an existing one with that id."""
+        line = '##INFO=<ID={},Number={},Type={},Description="{}">'.format(
+            id, number, type, description)
+        prefix = '##INFO=<ID={},'.format(id)
+        position = len(self.meta)
+        for i, meta in enumerate(self.meta):
+            if meta.startswith(prefix):
+                self.meta[i] = line
+                return
+            if meta.startswith('##INFO='):
+                position = i + 1
+        self.meta.insert(position, line)
+
+    def lines(self):
+        return self.meta + ['#' + '\t'.join(self.columns)]
+
+
+class VCFRecord(object):
+    """a VCF data line, split into columns on first access.
+
+    the FORMAT and sample columns are never split; they stay in one
+    string that is written back as is.
+    """
+    __slots__ = ('line', '_fields')
+
+    def __init__(self, line):
+        self.line = line.rstrip('\r\n')
+        self._fields = None
+
+    def _field(self, index):
+        if self._fields is None:
+            self._fields = self.line.split('\t', 8)
+        return self._fields[index]
+
+    @property
+    def CHROM(self):
+        return self._field(CHROM)
+
+    @property
+    def POS(self):
+        return int(self._field(POS))
+
+    @property
+    def ID(self):
+        return self._field(ID)
+
+    @property
+    def REF(self):
+        return self._field(REF)
+
+    @property
+    def ALT(self):
+        """list of ALT alleles, empty if there are none ('.')"""
+        alt = self._field(ALT)
+        return [] if alt == '.' else alt.split(',')
+
+    @property
+    def QUAL(self):
+        return self._field(QUAL)
+
+    @property
+    def FILTER(self):
+        return self._field(FILTER)
+
+    @property
+    def INFO(self):
+        """the raw INFO column"""
+        return self._field(INFO)
+
+    def format(self, alt=None, info=None):
+        """return the line of the record with ALT and/or INFO replaced.
+
+        :param alt: list of ALT alleles, None keeps the original
+        :param info: raw INFO column, None keeps the original
+        """
+        if alt is None and info is None:
+            return self.line
+        fields = list(self._fields or self.line.split('\t', 8))
+        if alt is not None:
+            fields[ALT] = ','.join(alt) if alt else '.'
+        if info is not None:
+            fields[INFO] = info
+        return '\t'.join(fields)
+
+
+class VCFReader(object):
+    """iterates over the records of a VCF file.
+
+    the header is parsed once when the reader is created.
+
+    :param path: VCF file, optionally (b)gzip compressed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open_vcf(path)
+        meta = []
+        for line in self._file:
+            line = line.rstrip('\r\n')
+            if line.startswith('##'):
+                meta.append(line)
+            elif line.startswith('#'):
+                self.header = VCFHeader(meta, line[1:].split('\t'))
+                break
+        else:
+            raise ValueError('{} has no #CHROM header line'.format(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for line in self._file:
+            if line.strip():
+                return VCFRecord(line)
+        raise StopIteration
+
+    next = __next__
+
+    def close(self):
+        self._file.close()
+
+
+class VCFWriter(object):
+    """writes a VCF header followed by record lines.
+
+    :param path: output file, gzip compressed if it ends with .gz
+    :param header: VCFHeader to write. None writes records only, e.g.
+        for shards that are merged with append_file later.
+    """
+
+    def __init__(self, path, header=None):
+        self._file = open_vcf(path, 'w')
+        if header is not None:
+            for line in header.lines():
+                self._file.write(line + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_line(self, line):
+        self._file.write(line + '\n')
+
+    def write_record(self, record):
+        self._file.write(record.line + '\n')
+
+    def append_file(self, path):
+        """copy all lines of another (headerless) VCF file."""
+        with open_vcf(path) as f:
+            for block in iter(lambda: f.read(1 << 20), ''):
+                self._file.write(block)
+
+    def close(self):
+        self._file.close()
+
+
+def _read_index(path):
+    """return (chromosome, first virtual offset) pairs from a tabix or CSI
+    index, or None if the index can't be used for sharding."""
+    with gzip.open(path, 'rb') as f:
+        data = f.read()
+
+    def unpack(fmt, offset):
+        return struct.unpack_from('<' + fmt, data, offset)
+
+    magic = data[:4]
+    if magic == b'TBI\x01':
+        n_ref, = unpack('i', 4)
+        l_nm, = unpack('i', 32)
+        names = data[36:36 + l_nm]
+        offset = 36 + l_nm
+        pseudo_bin = 37450
+        has_loffset = False
+    elif magic == b'CSI\x01':
+        min_shift, depth, l_aux = unpack('iii', 4)
+        aux = data[16:16 + l_aux]
+        if l_aux < 28:
+            # no tabix style header with sequence names (e.g. BCF)
+            return None
+        l_nm, = struct.unpack_from('<i', aux, 24)
+        names = aux[28:28 + l_nm]
+        offset = 16 + l_aux
+        n_ref, = unpack('i', offset)
+        offset += 4
+        pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+        has_loffset = True
+    else:
+        return None
+
+    names = names.rstrip(b'\x00').decode('utf8').split('\x00')
+    starts = []
+    for name in names[:n_ref]:
+        n_bin, = unpack('i', offset)
+        offset += 4
+        first = None
+        for _ in range(n_bin):
+            bin_id, = unpack('I', offset)
+            offset += 4
+            if has_loffset:
+                offset += 8
+            n_chunk, = unpack('i', offset)
+            offset += 4
+            if bin_id != pseudo_bin:
+                for i in range(n_chunk):
+                    begin, = unpack('Q', offset + 16 * i)
+                    if first is None or begin < first:
+                        first = begin
+            offset += 16 * n_chunk
+        if not has_loffset:
+            n_intv, = unpack('i', offset)
+            offset += 4 + 8 * n_intv
+        if first is not None:
+            starts.append((name, first))
+    return starts
+
+
+def _data_offset(path):
+    """return the byte offset of the first data line of a plain VCF."""
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.startswith(b'#'):
+                break
+            offset += len(line)
+    return offset
+
+
+def plan_shards(path, count):
+    """split a VCF file into shards that can be read independently.
+
+    plain files are split into count byte ranges at line boundaries.
+    bgzip compressed files with a .tbi or .csi index are split by
+    chromosome, other compressed files can't be split and form a
+    single shard. Reading the shards in the returned order yields the
+    records in file order.
+
+    :return: list of shards, to be passed to iter_shard
+    """
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == _GZIP_MAGIC
+
+    if not compressed:
+        start = _data_offset(path)
+        size = os.path.getsize(path)
+        bounds = [start + (size - start) * i // count for i in range(count)]
+        with open(path, 'rb') as f:
+            for i in range(1, count):
+                # move every bound to the start of the next line
+                f.seek(bounds[i] - 1)
+                f.readline()
+                bounds[i] = max(f.tell(), bounds[i - 1])
+        bounds.append(size)
+        return [
+            ('range', bounds[i], bounds[i + 1])
+            for i in range(count) if bounds[i] < bounds[i + 1]
+            ]
+
+    for index in (path + '.tbi', path + '.csi'):
+        if os.path.exists(index):
+            starts = _read_index(index)
+            if starts:
+                return [
+                    ('chrom', name, voffset)
+                    for name, voffset in sorted(starts, key=lambda s: s[1])
+                    ]
+    return [('all',)]
+
+
+def iter_shard(path, shard):
+    """yield the records of a shard returned by plan_shards."""
+    kind = shard[0]
+    if kind == 'range':
+        _, start, end = shard
+        with open(path, 'rb') as f:
+            f.seek(start)
+            position = start
+            while position < end:
+                line = f.readline()
+                if not line:
+                    break
+                position += len(line)
+                if line.strip():
+                    yield VCFRecord(line.decode('utf8'))
+    elif kind == 'chrom':
+        _, chrom, voffset = shard
+        prefix = (chrom + '\t').encode('utf8')
+        with open(path, 'rb') as f:
+            # a virtual offset addresses a bgzip block and a position in it
+            f.seek(voffset >> 16)
+            with gzip.GzipFile(fileobj=f, mode='rb') as gz:
+                gz.read(voffset & 0xffff)
+                for line in gz:
+                    if not line.startswith(prefix):
+                        break
+                    yield VCFRecord(line.decode('utf8'))
+    else:
+        with VCFReader(path) as reader:
+            for record in reader:
+                yield record